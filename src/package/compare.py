@@ -1,78 +1,344 @@
-"""Compare the files in two directories."""
+"""Compare the files in two directories.
+
+The results of env compares are kept in memory, keyed on the source and
+env directories, for as long as the stats of both trees (or of the env's
+RECORD) are unchanged; `invalidate` drops them explicitly.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import Executor, Future
 from pathlib import Path
+from typing import Iterable
 
 from package.config import config
+from package.ignore import IgnoreRules, tree_rules
+from package.digest_cache import DigestCache, digest_cache
+from package.env_version import EnvironmentVersion
+
+# (source dir, env dir, mode) -> (signature, (missing, mismatches))
+_results: dict[tuple[str, str, str], tuple[str, tuple]] = {}
+_results_lock = threading.Lock()
+
+
+def invalidate(path: str) -> None:
+    """Forget the compare results of the trees that contain path."""
+    path = Path(path)
+    with _results_lock:
+        for key in list(_results):
+            if any(path.is_relative_to(directory) for directory in key[:2]):
+                del _results[key]
+
+
+def compare_many(
+        source_dir: str,
+        env_versions: Iterable[EnvironmentVersion],
+        cache: DigestCache = None,
+        mode: str = '') -> dict[str, tuple[list[tuple], list[str]]]:
+    """Compare the project source with several installed copies.
+
+    The source tree is listed and hashed once and every env is checked
+    against it. Returns (missing, mismatches) keyed on env name.
+    """
+    source = _Source(Path(source_dir), cache or digest_cache())
+    results = {env_version.name: source.compare_env(env_version, mode)
+               for env_version in env_versions}
+    source.cache.save()
+    return results
+
+
+def compare_async(
+        source_dir: str,
+        env_versions: Iterable[EnvironmentVersion],
+        executor: Executor,
+        cache: DigestCache = None) -> dict[str, Future]:
+    """Submit one compare per env to executor, sharing one source scan.
+
+    Returns futures of (missing, mismatches) keyed on env name. The caller
+    saves the cache once the futures are done.
+    """
+    source = _Source(Path(source_dir), cache or digest_cache())
+    return {env_version.name: executor.submit(source.compare_env, env_version)
+            for env_version in env_versions}
+
+
+def compare_env(
+        source_dir: str,
+        env_version: EnvironmentVersion,
+        cache: DigestCache = None,
+        mode: str = '') -> tuple[list[tuple], list[str]]:
+    """Compare the project source with an installed copy.
+
+    In 'record' mode (opt-in; config item `compare_mode` unless mode is
+    given) the source is checked against the hashes in the install's
+    RECORD, so no installed file is read. RECORD describes the install,
+    not later edits to the installed files, so in 'files' mode, or if
+    there is no RECORD, the installed files themselves are compared.
+    """
+    return compare_many(
+        source_dir, [env_version], cache, mode)[env_version.name]
+
+
+def compare_record(
+        source_dir: str,
+        record: dict[str, tuple[str, int]],
+        cache: DigestCache = None) -> tuple[list[tuple], list[str]]:
+    """Compare the source with recorded (sha256, size) by relative path.
+
+    Returns missing and mismatches as `compare` does; source digests are
+    taken from the cache.
+    """
+    source = _Source(Path(source_dir), cache or digest_cache())
+    result = source.compare_record(record)
+    source.cache.save()
+    return result
+
+
+def compare(
+        source_dir: str,
+        env_dir: str,
+        cache: DigestCache = None) -> tuple[list[tuple], list[str]]:
+    """Compare the standard and dev versions of the package.
+
+    Both trees are compared recursively and items are reported by their
+    path relative to the compared directories. A pair of subdirectories is
+    only descended into if their Merkle hashes (see `tree_digest`) differ.
+
+    Files of different sizes differ and a file compared with itself (same
+    device and inode) is identical. Otherwise their digests are compared;
+    a digest is taken from the cache while the file is unchanged, so a
+    source file is read at most once however many envs it is compared
+    with.
+    """
+    source = _Source(Path(source_dir), cache or digest_cache())
+    result = source.compare_dir(Path(env_dir))
+    source.cache.save()
+    return result
+
+
+class _Source():
+    """A project source tree, listed and hashed once for many compares.
+
+    Missing items are (env only, project only) relative paths.
+    """
+
+    def __init__(self, source_dir: Path, cache: DigestCache) -> None:
+        self.dir = source_dir
+        self.cache = cache
+        self._listings: dict[Path, dict[str, Path]] = {}
+        self._tree_digests: dict[Path, str] = {}
+        self._fingerprint: dict[str, tuple[str, int]] = None
+        self._signatures: dict[Path, str] = {}
+        # The env side is matched with the rules of the source tree.
+        self.rules = tree_rules(source_dir)
+        # Envs may be compared on several threads at once.
+        self._lock = threading.RLock()
+
+    def compare_env(
+            self,
+            env_version: EnvironmentVersion,
+            mode: str = '') -> tuple[list[tuple], list[str]]:
+        """Compare with env_version, reusing a result if nothing changed."""
+        # pylint: disable=no-member
+        record_path = None
+        if (mode or config.compare_mode) == 'record':
+            record_path = env_version.record_path()
+        if record_path:
+            mode, env_signature = 'record', _stat_signature(record_path)
+        else:
+            mode = 'files'
+            env_signature = self.signature(Path(env_version.dir))
+        key = (str(self.dir), str(env_version.dir), mode)
+        signature = f'{self.signature(self.dir)}:{env_signature}'
+        with _results_lock:
+            cached = _results.get(key)
+        if cached and cached[0] == signature:
+            return _copy(cached[1])
+
+        result = None
+        if record_path:
+            record = env_version.record()
+            if record is not None:
+                result = self.compare_record(record)
+        if result is None:
+            result = self.compare_dir(Path(env_version.dir))
+        with _results_lock:
+            _results[key] = (signature, _copy(result))
+        return result
+
+    def compare_record(
+            self,
+            record: dict[str, tuple[str, int]]
+            ) -> tuple[list[tuple], list[str]]:
+        fingerprint = self.fingerprint()
+        # Files the source ignores are not compared, as in 'files' mode.
+        record = {path: entry for path, entry in record.items()
+                  if not self.rules.ignored(path)}
+        missing, mismatches = [], []
+        for path in sorted(fingerprint.keys() | record.keys()):
+            if path not in fingerprint:
+                missing.append((path, ''))
+            elif path not in record:
+                missing.append(('', path))
+            else:
+                digest, size = fingerprint[path]
+                recorded_digest, recorded_size = record[path]
+                if (digest != recorded_digest
+                        or 0 <= recorded_size != size):
+                    mismatches.append(path)
+        return (missing, mismatches)
+
+    def compare_dir(self, env_dir: Path) -> tuple[list[tuple], list[str]]:
+        missing, mismatches = [], []
+        self._compare_dirs(self.dir, env_dir, '', missing, mismatches)
+        return (missing, mismatches)
+
+    def _compare_dirs(
+            self,
+            project_dir: Path,
+            env_dir: Path,
+            relative: str,
+            missing: list[tuple[str, str]],
+            mismatches: list[str]) -> None:
+        comparison = {}
+        for location, directory in (('project', project_dir),
+                                    ('env', env_dir)):
+            for name, path in self.items(directory, relative).items():
+                comparison.setdefault(name, {})[location] = path
+
+        for name, files in comparison.items():
+            path = f'{relative}{name}'
+            if 'project' not in files:
+                missing.append((path, ''))
+            elif 'env' not in files:
+                missing.append(('', path))
+            elif files['project'].is_dir() and files['env'].is_dir():
+                if (self.tree_digest(files['project'], f'{path}/')
+                        != self.tree_digest(files['env'], f'{path}/')):
+                    self._compare_dirs(files['project'], files['env'],
+                                       f'{path}/', missing, mismatches)
+            elif files['project'].is_dir() or files['env'].is_dir():
+                mismatches.append(path)
+            elif _differ(files['project'], files['env'], self.cache):
+                mismatches.append(path)
+
+    def fingerprint(self) -> dict[str, tuple[str, int]]:
+        """Return {relative path: (sha256, size)} for the source files."""
+        with self._lock:
+            if self._fingerprint is None:
+                self._fingerprint = {}
+                for path, source in self._files(self.dir, '').items():
+                    try:
+                        stat = os.stat(source)
+                    except OSError:
+                        continue
+                    self._fingerprint[path] = (
+                        self.cache.digest(source, stat), stat.st_size)
+            return self._fingerprint
+
+    def tree_digest(self, directory: Path, relative: str) -> str:
+        """Return the Merkle hash of directory.
+
+        It is the sha256 of the names, kinds and hashes of its items, so
+        two trees have the same hash only if their contents are identical.
+        """
+        if directory in self._tree_digests:
+            return self._tree_digests[directory]
+
+        sha256 = hashlib.sha256()
+        for name, path in self.items(directory, relative).items():
+            if path.is_dir():
+                digest = f'd:{self.tree_digest(path, f"{relative}{name}/")}'
+            else:
+                digest = f'f:{self.cache.digest(path)}'
+            sha256.update(f'{name}\0{digest}\0'.encode())
+        self._tree_digests[directory] = sha256.hexdigest()
+        return self._tree_digests[directory]
+
+    def signature(self, directory: Path) -> str:
+        """Return a hash of the names, sizes and mtimes below directory."""
+        with self._lock:
+            if directory in self._signatures:
+                return self._signatures[directory]
+        sha256 = hashlib.sha256()
+        directories = [(directory, '')]
+        while directories:
+            parent, relative = directories.pop()
+            for name, path in self.items(parent, relative).items():
+                if path.is_dir():
+                    stat_signature = 'd'
+                    directories.append((path, f'{relative}{name}/'))
+                else:
+                    stat_signature = _stat_signature(path)
+                sha256.update(
+                    f'{relative}{name}\0{stat_signature}\0'.encode())
+        with self._lock:
+            self._signatures[directory] = sha256.hexdigest()
+            return self._signatures[directory]
+
+    def items(self, directory: Path, relative: str) -> dict[str, Path]:
+        """Return the items in directory (at relative), listed once."""
+        with self._lock:
+            if directory not in self._listings:
+                self._listings[directory] = _items(
+                    directory, self.rules, relative)
+            return self._listings[directory]
+
+    def _files(self, directory: Path, relative: str) -> dict[str, Path]:
+        files = {}
+        for name, path in self.items(directory, relative).items():
+            if path.is_dir():
+                files |= self._files(path, f'{relative}{name}/')
+            else:
+                files[f'{relative}{name}'] = path
+        return files
+
+
+def _stat_signature(path: Path) -> str:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ''
+    return f'{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}'
+
+
+def _copy(result: tuple[list, list]) -> tuple[list, list]:
+    missing, mismatches = result
+    return (list(missing), list(mismatches))
+
+
+def _differ(path_0: Path, path_1: Path, cache: DigestCache) -> bool:
+    try:
+        stat_0, stat_1 = os.stat(path_0), os.stat(path_1)
+    except OSError:
+        return True
+    if stat_0.st_size != stat_1.st_size:
+        return True
+    if (stat_0.st_dev, stat_0.st_ino) == (stat_1.st_dev, stat_1.st_ino):
+        return False
+
+    # The source digest is taken once (and cached) for all envs; only
+    # the env side is read for each compare.
+    digest_0 = cache.digest(path_0, stat_0)
+    if not digest_0:
+        return True
+    return digest_0 != cache.digest(path_1, stat_1)
 
 
-def compare(source_dir: str, env_dir: str) -> list[str]:
-    """Compare the standard and dev versions of the package."""
-    # comparison is a dict keyed on file name
-    # each element contains 'project' and 'env' entries if the file exists in
-    # the relevant directories
-    comparison = {}
-    comparison = _build_comparison(comparison, source_dir, 'project')
-    comparison = _build_comparison(comparison, env_dir, 'env')
-
-    missing = _compare_existence(comparison)
-    mismatches = _compare_contents(comparison)
-    return (missing, mismatches)
-
-
-def _compare_existence(comparison: dict) -> list:
-    missing = []
-    for name, files in comparison.items():
-        if 'project' not in files:
-            missing.append((name, ''))
-        if 'env' not in files:
-            missing.append(('', name))
-    return missing
-
-
-def _compare_contents(comparison: dict) -> list:
-    mismatches = []
-    for name, files in comparison.items():
-        if 'project' in files and 'env' in files:
-            contents_0 = _file_contents(files['project'])
-            contents_1 = _file_contents(files['env'])
-            if contents_0 != contents_1:
-                mismatches.append(name)
-    return mismatches
-
-
-def _file_contents(path: str) -> str:
-    if not path.is_file():
-        file_list = list(path.iterdir())
-        return len(file_list)
-    with open(path, 'r', encoding='utf-8') as f_contents:
-        return f_contents.read()
-
-
-def _build_comparison(
-        comparison: dict, search_path: str, location: str) -> dict:
-    # pylint: disable=no-member)
-    search_dir = Path(search_path)
-    file_list = []
+def _items(
+        directory: Path,
+        rules: IgnoreRules,
+        relative: str) -> dict[str, Path]:
+    """Return the directory's items that are not ignored, sorted by name."""
     try:
-        file_list.extend(
-            name
-            for name in search_dir.iterdir()
-            if name.is_file() or name.is_dir()
-        )
-    except FileNotFoundError:
-        return {str(search_dir): 'xxx'}
-
-    # try:
-    #     file_list = [name for name in search_dir.iterdir()
-    #                  if name.is_file() or name.is_dir()]
-    # except FileNotFoundError:
-    #     return {}
-
-    for path in file_list:
-        file_name = path.name
-        if file_name in config.ignore:
-            continue
-        if file_name not in comparison:
-            comparison[file_name] = {}
-
-        comparison[file_name][location] = path
-    return comparison
+        with os.scandir(directory) as entries:
+            items = {
+                entry.name: Path(entry.path) for entry in entries
+                if (entry.is_file() or entry.is_dir())
+                and not rules.ignored(
+                    f'{relative}{entry.name}', entry.is_dir())
+            }
+    except (FileNotFoundError, NotADirectoryError):
+        # Compared as an empty directory: all of its counterpart is missing.
+        return {}
+    return dict(sorted(items.items()))
@@ -9,6 +9,25 @@ DEFAULT_CONFIG = {
     'script_directory': '',
     'project_file': 'projects.json',
     'ignore': [],
+    'compare_mode': 'files',
+    'env_discovery': 'scandir',
+    'scan_workers': 8,
+    'env_scan_budget': 60,
+    'env_roots': [
+        {
+            'path': '~/.pyenv/versions',
+            'max_depth': 3,
+            'exclude': [],
+        },
+        {
+            'path': '~/projects',
+            'max_depth': 4,
+            'exclude': ['node_modules', 'build', 'dist', '*.egg-info'],
+        },
+    ],
+    'watch_interval': 1000,
+    'search_hits_per_file': 20,
+    'search_max_hits': 5000,
     'geometry': {
         'frm_main': '1400x600',
         'frm_config': '800x200',
@@ -12,6 +12,11 @@ AUTHOR = 'Jeff Watkins'
 ICON_FILE = Path(Path(__file__).parent, 'images', 'favicon.png')
 
 DATA_FILE = 'projects.json'
+ENV_INDEX_FILE = 'env_index.json'
+METADATA_CACHE_FILE = 'metadata_cache.json'
+DIGEST_CACHE_FILE = 'digest_cache.json'
+TRIGRAM_INDEX_FILE = 'trigram_index.sqlite'
+SYMBOL_INDEX_FILE = 'symbol_index.sqlite'
 
 HISTORY_FILE = 'HISTORY.md'
 VERSION_FILE = '_version.py'
@@ -0,0 +1,124 @@
+"""
+    digest_cache
+    ============
+
+    Persistent cache of file content digests (sha256), stored in DATA_DIR.
+
+    Each digest is stored with the (size, mtime_ns, inode) of the file it
+    was computed from. While the stat of a file still matches, its stored
+    digest is reused, so comparing an unchanged tree again reads no file
+    contents.
+
+    Usage Example
+    -------------
+    >>> cache = DigestCache()
+    >>> cache.digest(Path('src/package/compare.py'))
+    '9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08'
+    >>> cache.save()
+"""
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from psiutils.constants import DIALOG_STATUS
+
+from package.constants import DATA_DIR, DIGEST_CACHE_FILE
+
+import package.projects_io as io
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DigestCache():
+    """sha256 digests of files with stat-based invalidation."""
+
+    def __init__(self, path: str = '') -> None:
+        self.path = Path(path) if path else Path(DATA_DIR, DIGEST_CACHE_FILE)
+        # file path -> [size, mtime_ns, inode, digest]
+        self.entries: dict = io.read_json_file(self.path).get('files', {})
+        self.changed = False
+        self._lock = threading.Lock()
+        # Held for a whole save, so saves cannot interleave.
+        self._save_lock = threading.Lock()
+
+    def digest(self, path: Path, stat: os.stat_result = None) -> str:
+        """Return the sha256 of the file at path; '' if it is unreadable."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return ''
+        if digest := self.cached(path, stat):
+            return digest
+
+        digest = file_digest(str(path))
+        if digest:
+            self.store(path, stat, digest)
+        return digest
+
+    def cached(self, path: Path, stat: os.stat_result) -> str:
+        """Return the stored digest of path if its stat still matches."""
+        with self._lock:
+            entry = self.entries.get(str(path))
+        if entry and entry[:3] == _signature(stat):
+            return entry[3]
+        return ''
+
+    def store(self, path: Path, stat: os.stat_result, digest: str) -> None:
+        """Record the digest of path computed when it had stat."""
+        with self._lock:
+            self.entries[str(path)] = _signature(stat) + [digest]
+            self.changed = True
+
+    def forget(self, path: Path) -> None:
+        """Drop the stored digest of path."""
+        with self._lock:
+            if self.entries.pop(str(path), None):
+                self.changed = True
+
+    def save(self) -> int:
+        """Write the cache to DATA_DIR if it has changed.
+
+        Entries for files that no longer exist are dropped first. The file
+        is replaced atomically, so an interrupted save leaves the previous
+        cache intact.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self.changed:
+                    return DIALOG_STATUS['ok']
+                paths = list(self.entries)
+            missing = [path for path in paths if not os.path.exists(path)]
+            with self._lock:
+                for path in missing:
+                    self.entries.pop(path, None)
+                output = {'files': dict(self.entries)}
+                self.changed = False
+            result = io.replace_json_file(self.path, output)
+            if result == {}:
+                with self._lock:
+                    self.changed = True
+            return result
+
+
+@lru_cache(maxsize=None)
+def digest_cache() -> DigestCache:
+    """Return the digest cache shared by the application."""
+    return DigestCache()
+
+
+def _signature(stat: os.stat_result) -> list[int]:
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def file_digest(path: str) -> str:
+    """Return the sha256 of the file at path; '' if it is unreadable."""
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f_contents:
+            while chunk := f_contents.read(CHUNK_SIZE):
+                sha256.update(chunk)
+    except OSError:
+        return ''
+    return sha256.hexdigest()
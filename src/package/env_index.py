@@ -0,0 +1,258 @@
+"""
+    env_index
+    =========
+
+    Persistent index of the registered projects installed in each
+    environment, stored in DATA_DIR.
+
+    The index records the mtime of every scanned `site-packages` directory
+    and of each pyenv `versions/*` directory (with its `envs` directory).
+    A refresh re-lists only the directories whose mtime has changed, and
+    queries are answered from the index without touching the disk.
+
+    One index is shared by the application (ProjectServer.env_index);
+    refreshes from different threads are serialised.
+
+    Usage Example
+    -------------
+    >>> index = EnvIndex()
+    >>> env_versions = index.refresh(['psiutils'])['psiutils']
+    >>> index.envs_older_than('psiutils', '0.2.0')
+    [IndexedEnv(name='tools', dir='...', python_version='python3.11',
+     version='0.1.61', mtime=1718000000000000000)]
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple
+
+from package import logger
+from package.constants import DATA_DIR, ENV_INDEX_FILE
+from package.env_scanner import (
+    EnvScanner, ScanRoot, SitePackages, scandir)
+from package.env_version import (
+    EnvironmentVersion, dist_info_versions, normalize_name)
+
+import package.projects_io as io
+
+
+class IndexedEnv(NamedTuple):
+    name: str
+    dir: str
+    python_version: str
+    version: str
+    # mtime_ns of the site-packages listing the version was read from
+    mtime: int
+
+
+class EnvIndex():
+    """Environment index with mtime-based incremental refresh."""
+
+    def __init__(
+            self,
+            roots: Iterable[str | ScanRoot] = (),
+            path: str = '') -> None:
+        self.path = Path(path) if path else Path(DATA_DIR, ENV_INDEX_FILE)
+        self.scanner = EnvScanner(roots)
+
+        data = io.read_json_file(self.path)
+        # Package names whose versions are recorded.
+        self.names: set[str] = set(data.get('names', []))
+        # pyenv versions/* dir -> {'mtimes': [...], 'site_packages': [...]}
+        self.versions_dirs: dict = data.get('versions_dirs', {})
+        # root -> {site-packages dir -> record}
+        self.roots: dict = data.get('roots', {})
+        self.incomplete = False
+        self._lock = threading.Lock()
+
+    def save(self) -> int:
+        """Write the index to DATA_DIR."""
+        output = {
+            'names': sorted(self.names),
+            'versions_dirs': self.versions_dirs,
+            'roots': self.roots,
+        }
+        return io.update_json_file(self.path, output)
+
+    def refresh(
+            self,
+            names: Iterable[str] = ()
+            ) -> dict[str, dict[str, EnvironmentVersion]]:
+        """Bring the index up to date and return the envs for names."""
+        with self._lock:
+            return self._refresh(set(names))
+
+    def _refresh(
+            self,
+            names: set[str]) -> dict[str, dict[str, EnvironmentVersion]]:
+        if self.scanner.discovery == 'walk':
+            # A full walk has no layout directories to index.
+            index = self.scanner.scan(names)
+            self.incomplete = self.scanner.incomplete
+            return index
+
+        self.names |= names
+        self.scanner.start_budget()
+        versions_dirs, roots = {}, {}
+        with ThreadPoolExecutor(max_workers=self.scanner.workers) as executor:
+            discovered = {
+                root.path: [executor.submit(subtree)
+                            for subtree in self._subtrees(root, versions_dirs)]
+                for root in self.scanner.roots
+            }
+            for root, futures in discovered.items():
+                old_records = self.roots.get(root, {})
+                site_packages = [
+                    item for future in futures for item in future.result()]
+                records = executor.map(
+                    partial(self._record, old_records=old_records),
+                    site_packages)
+                roots[root] = {
+                    item.path: record
+                    for item, record in zip(site_packages, records)
+                    if record
+                }
+
+        self.incomplete = self.scanner.incomplete
+        if self.incomplete:
+            # Keep what the scan did not reach rather than forget it.
+            logger.warning(
+                "Environment scan exceeded its time budget",
+                budget=self.scanner.budget,
+            )
+            versions_dirs = self.versions_dirs | versions_dirs
+            roots = {root: self.roots.get(root, {}) | records
+                     for root, records in roots.items()}
+
+        self.versions_dirs = versions_dirs
+        self.roots = roots
+        self.save()
+        return {name: self.environments(name) for name in names}
+
+    def environments(self, name: str) -> dict[str, EnvironmentVersion]:
+        """Return the EnvironmentVersions that contain name."""
+        return {
+            env_name: EnvironmentVersion(
+                (env.name, env.dir, env.python_version),
+                env.version,
+                env.mtime)
+            for env_name, env in self._indexed(name).items()
+        }
+
+    def envs_containing(self, name: str) -> list[IndexedEnv]:
+        """Return the indexed envs that contain name."""
+        return list(self._indexed(name).values())
+
+    def envs_older_than(self, name: str, version: str) -> list[IndexedEnv]:
+        """Return the indexed envs where name is older than version."""
+        limit = version_key(version)
+        if limit is None:
+            return []
+        return [env for env in self._indexed(name).values()
+                if (key := version_key(env.version)) is not None
+                and key < limit]
+
+    def _indexed(self, name: str) -> dict[str, IndexedEnv]:
+        # Within a root the first env found wins; later roots override.
+        indexed = {}
+        for records in self.roots.values():
+            root_envs = {}
+            for path, record in records.items():
+                if name not in record['packages']:
+                    continue
+                env_name = record['env']
+                if env_name not in root_envs:
+                    root_envs[env_name] = IndexedEnv(
+                        env_name,
+                        str(Path(path, name)),
+                        record['python'],
+                        record['packages'][name],
+                        record['mtime'],
+                    )
+            indexed |= root_envs
+        return indexed
+
+    def _subtrees(
+            self,
+            root: ScanRoot,
+            versions_dirs: dict) -> list[Callable[[], list[SitePackages]]]:
+        if not root.is_pyenv:
+            return self.scanner.subtrees(root)
+        return [
+            partial(self._version_site_packages,
+                    version_dir, root, versions_dirs)
+            for version_dir in self.scanner.subdirs(root, root.path)
+        ]
+
+    def _version_site_packages(
+            self,
+            version_dir: str,
+            root: ScanRoot,
+            versions_dirs: dict) -> list[SitePackages]:
+        mtimes = [_mtime(version_dir), _mtime(Path(version_dir, 'envs'))]
+        cached = self.versions_dirs.get(version_dir)
+        if cached and cached['mtimes'] == mtimes:
+            site_packages = [SitePackages(*item)
+                             for item in cached['site_packages']]
+        else:
+            site_packages = list(
+                self.scanner.pyenv_version_site_packages(version_dir, root))
+            if self.scanner.expired():
+                return site_packages
+        versions_dirs[version_dir] = {
+            'mtimes': mtimes,
+            'site_packages': site_packages,
+        }
+        return site_packages
+
+    def _record(
+            self, site_packages: SitePackages, old_records: dict) -> dict:
+        record = old_records.get(site_packages.path)
+        if self.scanner.expired():
+            return record
+
+        mtime = _mtime(site_packages.path)
+        if not mtime:
+            return {}
+
+        if not record or record['mtime'] != mtime:
+            record = {
+                'mtime': mtime,
+                'env': site_packages.env_name,
+                'python': site_packages.python_version,
+                'entries': [entry.name
+                            for entry in scandir(site_packages.path)
+                            if entry.is_dir()],
+                'packages': {},
+            }
+
+        # Names registered since the directory was listed.
+        entries = set(record['entries'])
+        versions = dist_info_versions(site_packages.path, record['entries'])
+        for name in self.names - set(record['packages']):
+            if name in entries:
+                env_version = EnvironmentVersion(
+                    (site_packages.env_name,
+                     str(Path(site_packages.path, name)),
+                     site_packages.python_version),
+                    versions.get(normalize_name(name), ''),
+                    record['mtime'])
+                record['packages'][name] = env_version.version
+        return record
+
+
+def version_key(version: str) -> tuple[int, ...] | None:
+    """Return a sortable key for a dotted version, or None."""
+    if match := re.match(r'^[0-9]+(\.[0-9]+)*', version):
+        return tuple(int(part) for part in match.group().split('.'))
+    return None
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
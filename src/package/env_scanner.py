@@ -0,0 +1,377 @@
+"""
+    env_scanner
+    ===========
+
+    Find the virtual environments that hold installed copies of the
+    registered projects.
+
+    The environment roots are walked once and every project name is
+    matched in the same pass, so refreshing all projects costs one walk
+    rather than one walk per project. Roots and their top-level subtrees
+    are scanned concurrently on a thread pool (config item
+    `scan_workers`).
+
+    The roots are configured in `env_roots`. Each has a `path`, a
+    `max_depth` (the deepest directory level below the root that is
+    searched for environments) and `exclude`, a list of globs matched
+    against directory names and root-relative paths; excluded directories
+    are never entered. The whole scan stops after `env_scan_budget`
+    seconds (0 for no limit), returning what it found so far and setting
+    `incomplete`.
+
+    Two discovery modes are supported (config item `env_discovery`):
+
+    scandir
+        Lists only the directory levels of the known layouts and goes
+        straight to `site-packages/<name>`; package contents are never
+        visited.
+
+        - `~/.pyenv/versions/<env>/lib/pythonX.Y/site-packages/<name>`
+        - `~/.pyenv/versions/<v>/envs/<env>/lib/pythonX.Y/site-packages/<name>`
+        - `<project>/.venv/lib/pythonX.Y/site-packages/<name>`
+
+        In a pyenv root a version is at level 1 and `envs/<env>` at
+        level 3.
+
+    walk
+        The original `os.walk` over everything below each root.
+        Exclusions and the time budget apply; `max_depth` does not.
+
+    Usage Example
+    -------------
+    >>> scanner = EnvScanner()
+    >>> index = scanner.scan(['psiutils', 'package'])
+    >>> index['psiutils']
+    {'projects': <EnvironmentVersion>, ...}
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import translate
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from package.config import config
+from package.env_version import (
+    EnvironmentVersion, dist_info_versions, normalize_name)
+
+VENV_DIR = '.venv'
+SITE_PACKAGES = 'site-packages'
+
+# A directory holding one of these is a project; its subdirectories are
+# not searched for further virtual environments.
+PROJECT_MARKERS = {VENV_DIR, 'pyproject.toml', 'setup.py'}
+
+DEFAULT_MAX_DEPTH = 4
+PYENV_VERSION_DEPTH = 1
+PYENV_ENV_DEPTH = 3
+
+
+class ScanRoot(NamedTuple):
+    path: str
+    max_depth: int = DEFAULT_MAX_DEPTH
+    exclude: tuple[str, ...] = ()
+
+    @property
+    def is_pyenv(self) -> bool:
+        return '.pyenv' in Path(self.path).parts
+
+    def excluded(self, path: str) -> bool:
+        """Return True if the directory at path is excluded."""
+        if not self.exclude:
+            return False
+        matcher = _compile_globs(self.exclude)
+        relative_path = os.path.relpath(path, self.path)
+        return bool(matcher.match(os.path.basename(path))
+                    or matcher.match(relative_path))
+
+
+class SitePackages(NamedTuple):
+    env_name: str
+    path: str
+    python_version: str
+
+
+def scan_roots() -> list[ScanRoot]:
+    """Return the env roots defined in config."""
+    # pylint: disable=no-member
+    return [
+        ScanRoot(
+            os.path.expanduser(root['path']),
+            root.get('max_depth', DEFAULT_MAX_DEPTH),
+            tuple(root.get('exclude', ())))
+        for root in config.env_roots
+    ]
+
+
+class EnvScanner():
+    """Build a package name -> {env name: EnvironmentVersion} index."""
+
+    def __init__(
+            self,
+            roots: Iterable[str | ScanRoot] = (),
+            discovery: str = '',
+            workers: int = 0,
+            budget: float = None) -> None:
+        # pylint: disable=no-member
+        self.roots = [
+            root if isinstance(root, ScanRoot) else ScanRoot(str(root))
+            for root in roots or scan_roots()]
+        self.discovery = discovery or config.env_discovery
+        self.workers = workers or config.scan_workers
+        self.budget = config.env_scan_budget if budget is None else budget
+        self.deadline = None
+        self.incomplete = False
+
+    def start_budget(self) -> None:
+        """Start the clock for a scan."""
+        self.incomplete = False
+        self.deadline = (time.monotonic() + self.budget
+                         if self.budget else None)
+
+    def expired(self) -> bool:
+        """Return True (and flag the scan incomplete) once over budget."""
+        if self.deadline and time.monotonic() > self.deadline:
+            self.incomplete = True
+        return self.incomplete
+
+    def scan(
+            self,
+            names: Iterable[str]) -> dict[str, dict[str, EnvironmentVersion]]:
+        """Return the environments for each name in a single pass.
+
+        Roots and their top-level subtrees are scanned concurrently; the
+        results are merged in root and directory order, so within a root
+        the first environment found wins and environments from later roots
+        override those of earlier ones.
+        """
+        names = set(names)
+        self.start_budget()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.discovery == 'walk':
+                root_indexes = list(executor.map(
+                    partial(self._scan_root_walk, names=names), self.roots))
+            else:
+                root_indexes = [
+                    self._root_index(site_packages, names, executor)
+                    for site_packages in self.discover(executor).values()]
+
+        index = {name: {} for name in names}
+        for root_index in root_indexes:
+            for name, env_versions in root_index.items():
+                index[name].update(env_versions)
+        return index
+
+    def _root_index(
+            self,
+            site_packages: list[SitePackages],
+            names: set[str],
+            executor: ThreadPoolExecutor) -> dict:
+        index = {name: {} for name in names}
+        all_packages = executor.map(
+            partial(self.packages, names=names), site_packages)
+        for item, packages in zip(site_packages, all_packages):
+            for name, env_version in packages.items():
+                index[name].setdefault(item.env_name, env_version)
+        return index
+
+    def packages(
+            self,
+            site_packages: SitePackages,
+            names: set[str]) -> dict[str, EnvironmentVersion]:
+        """Return the named packages installed in site_packages."""
+        packages = {}
+        if self.expired():
+            return packages
+        # Taken before the listing, so a later change invalidates it.
+        mtime = _mtime(site_packages.path)
+        entries = scandir(site_packages.path)
+        versions = dist_info_versions(
+            site_packages.path, [entry.name for entry in entries])
+        for entry in entries:
+            if entry.name in names and entry.is_dir():
+                data = (
+                    site_packages.env_name,
+                    entry.path,
+                    site_packages.python_version)
+                packages[entry.name] = EnvironmentVersion(
+                    data, versions.get(normalize_name(entry.name), ''), mtime)
+        return packages
+
+    def discover(
+            self,
+            executor: ThreadPoolExecutor) -> dict[str, list[SitePackages]]:
+        """Return the site-packages below each root, in directory order."""
+        futures = {
+            root.path: [executor.submit(subtree)
+                        for subtree in self.subtrees(root)]
+            for root in self.roots
+        }
+        return {
+            root: [item for future in root_futures for item in future.result()]
+            for root, root_futures in futures.items()
+        }
+
+    def subtrees(
+            self,
+            root: ScanRoot) -> list[Callable[[], list[SitePackages]]]:
+        """Return one discovery task per top-level subtree of root.
+
+        Running the tasks in order and concatenating their results gives
+        the same order as a sequential scan of root.
+        """
+        if root.is_pyenv:
+            # Named pyenv-virtualenv envs also appear in versions/ as
+            # symlinks; like os.walk(followlinks=False) they are only seen
+            # via envs/.
+            if root.max_depth < PYENV_VERSION_DEPTH:
+                return []
+            return [
+                partial(_as_list, self.pyenv_version_site_packages,
+                        version_dir, root)
+                for version_dir in self.subdirs(root, root.path)
+            ]
+
+        entries = scandir(root.path)
+        if {entry.name for entry in entries} & PROJECT_MARKERS:
+            return [partial(
+                _as_list, self._venv_site_packages, root.path, root, 0)]
+        if root.max_depth < 1:
+            return []
+        entries = [entry for entry in entries
+                   if not entry.name.startswith('.')]
+        return [
+            partial(_as_list, self._venv_site_packages, path, root, 1)
+            for path in self.subdirs(root, root.path, entries)
+        ]
+
+    @staticmethod
+    def subdirs(
+            root: ScanRoot,
+            directory: str,
+            entries: list[os.DirEntry] = None) -> list[str]:
+        """Return the subdirectories of directory that may be searched."""
+        if entries is None:
+            entries = scandir(directory)
+        return [
+            entry.path for entry in entries
+            if entry.is_dir(follow_symlinks=False)
+            and not root.excluded(entry.path)
+        ]
+
+    def pyenv_version_site_packages(
+            self,
+            version_dir: str,
+            root: ScanRoot) -> Iterator[SitePackages]:
+        """Yield the site-packages of a pyenv version and its envs."""
+        if self.expired():
+            return
+        yield from self._lib_site_packages(
+            Path(version_dir).name, version_dir)
+        if root.max_depth < PYENV_ENV_DEPTH:
+            return
+        for env_dir in self.subdirs(root, Path(version_dir, 'envs')):
+            if self.expired():
+                return
+            yield from self._lib_site_packages(Path(env_dir).name, env_dir)
+
+    def _venv_site_packages(
+            self,
+            path: str,
+            root: ScanRoot,
+            depth: int) -> Iterator[SitePackages]:
+        directories = [(str(path), depth)]
+        while directories and not self.expired():
+            directory, depth = directories.pop()
+            entries = scandir(directory)
+            entry_names = {entry.name for entry in entries}
+            if VENV_DIR in entry_names:
+                yield from self._lib_site_packages(
+                    Path(directory).name, Path(directory, VENV_DIR))
+            if entry_names & PROJECT_MARKERS or depth >= root.max_depth:
+                continue
+            entries = [entry for entry in reversed(entries)
+                       if not entry.name.startswith('.')]
+            directories.extend(
+                (subdir, depth + 1)
+                for subdir in self.subdirs(root, directory, entries))
+
+    @staticmethod
+    def _lib_site_packages(
+            env_name: str, env_dir: str) -> Iterator[SitePackages]:
+        for python in scandir(Path(env_dir, 'lib')):
+            if not python.name.startswith('python'):
+                continue
+            path = Path(python.path, SITE_PACKAGES)
+            if path.is_dir():
+                yield SitePackages(env_name, str(path), python.name)
+
+    def _scan_root_walk(self, root: ScanRoot, names: set[str]) -> dict:
+        index = {name: {} for name in names}
+
+        for directory, subdirs, files in os.walk(
+                root.path, followlinks=False):
+            del files
+            if self.expired():
+                break
+            subdirs[:] = [name for name in subdirs
+                          if not root.excluded(os.path.join(directory, name))]
+
+            parts = Path(directory).parts
+            if '.venv' in parts:
+                start_index = parts.index('.venv')
+                project_name_index = start_index + 4
+                environment_index = start_index - 1
+                python_version_index = start_index + 2
+            elif '.pyenv' in parts:
+                start_index = parts.index('.pyenv')
+                project_name_index = start_index + 6
+                environment_index = start_index + 2
+                python_version_index = start_index + 4
+            else:
+                continue
+
+            if len(parts) <= project_name_index:
+                continue
+
+            name = parts[project_name_index]
+            if name not in names:
+                continue
+
+            environment_name = parts[environment_index]
+            if environment_name not in index[name]:
+                data = (
+                    environment_name,
+                    directory,
+                    parts[python_version_index])
+                index[name][environment_name] = EnvironmentVersion(data)
+        return index
+
+
+def _as_list(
+        generator: Callable[..., Iterator[SitePackages]],
+        *args) -> list[SitePackages]:
+    return list(generator(*args))
+
+
+@lru_cache(maxsize=None)
+def _compile_globs(patterns: tuple[str, ...]) -> re.Pattern:
+    return re.compile('|'.join(translate(pattern) for pattern in patterns))
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def scandir(path: str) -> list[os.DirEntry]:
+    """Return the entries of path sorted by name, or [] if unreadable."""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entries, key=lambda entry: entry.name)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
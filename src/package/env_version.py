@@ -3,8 +3,10 @@
     ====================
 
     Provides tools for representing and managing Python virtual environment
-    metadata, including directory paths, Python versions, and version
-    information from a `_version.py` file.
+    metadata, including directory paths, Python versions, and the installed
+    version read from the `<name>-<version>.dist-info` directory name (or
+    its METADATA), falling back to a `_version.py` file, and the hashes of
+    the installed files recorded in the dist-info RECORD.
 
     Classes
     -------
@@ -35,15 +37,26 @@
 
     Notes
     -----
-    - Version extraction looks for a semantic version pattern (e.g.,
-    '1.2.3') in `_version.py`.
+    - The version normally comes from the dist-info directory in the same
+    `site-packages` listing, so it costs no file reads. Only when there is
+    no dist-info is a semantic version pattern (e.g., '1.2.3') looked
+    for in `_version.py`.
+    - A version supplied by discovery is trusted only together with the
+    mtime of the `site-packages` listing it came from; without one it is
+    re-read on first use. Construction never touches the disk.
     - Supports `.venv` and `.pyenv` layouts when locating the Python
     executable.
 """
+import base64
+import csv
 import os
 import re
 from pathlib import Path
-from typing import NamedTuple
+from typing import Iterable, NamedTuple
+
+DIST_INFO = '.dist-info'
+METADATA = 'METADATA'
+RECORD = 'RECORD'
 
 
 class EnvironmentData(NamedTuple):
@@ -59,7 +72,7 @@ class EnvironmentVersion():
 
     __init__:
     Initialize the EnvironmentVersion instance with optional data
-    and set attributes. Deserialize data if provided and get the version.
+    and set attributes. Deserialize data if provided.
 
     serialize:
     Return a tuple of the version for JSON serialization.
@@ -67,26 +80,46 @@ class EnvironmentVersion():
     deserialize:
     Deserialize the version from JSON data.
 
+    version:
+    Lazy property: the installed version, cached against the mtime of
+    the site-packages directory or version file it was read from.
+
+    venv_python:
+    Lazy property: the path to the environment's Python executable.
+
     _get_version:
-    Get the version from a file in the directory.
+    Get the version from the dist-info listing, else from a file in the
+    directory.
 
     _get_venv_python:
     Get the path to the Python executable in a virtual environment.
 
+    record:
+    Return the sha256 and size of each installed file from RECORD.
+
+    record_path:
+    Return the path of the dist-info RECORD file.
+
     dir_short:
     Property method to return a shortened directory path.
     """
 
-    def __init__(self, data: EnvironmentData = None) -> None:
+    def __init__(
+            self,
+            data: EnvironmentData = None,
+            version: str = '',
+            version_mtime: int = 0) -> None:
         self.name = ''
         self.dir = ''
         self.python_version = ''
         self.type = ''
+        self._version = ''
+        self._version_path = None
+        self._version_mtime = 0
+        self._venv_python = None
 
         if data:
-            self.deserialize(data)
-
-        self.version = self._get_version()
+            self.deserialize(data, version, version_mtime)
 
     def serialize(self) -> tuple:
         """Return a tuple of the version for json serialization."""
@@ -96,16 +129,62 @@ class EnvironmentVersion():
             self.python_version,
         )
 
-    def deserialize(self, data: list | tuple) -> None:
-        """Deserialize the version from json."""
+    def deserialize(
+            self,
+            data: list | tuple,
+            version: str = '',
+            version_mtime: int = 0) -> None:
+        """Deserialize the version from json.
+
+        No files are read here; version and venv_python are resolved when
+        first used. version is trusted while the site-packages directory
+        keeps version_mtime, the mtime it had when version was read.
+        """
         environ = EnvironmentData(*data)
 
         self.name = environ.name
         self.dir = environ.dir
         self.python_version = environ.python_version
-        self.version = self._get_version()
-        self.venv_python = self._get_venv_python()
-    def _get_version(self):
+        self._version = ''
+        self._version_path = None
+        self._version_mtime = 0
+        self._venv_python = None
+        if version and version_mtime:
+            self._version = version
+            self._version_path = Path(self.dir).parent
+            self._version_mtime = version_mtime
+
+    @property
+    def version(self) -> str:
+        """Return the installed version, re-read if its source changed."""
+        if (self._version_path
+                and _mtime(self._version_path) == self._version_mtime):
+            return self._version
+
+        self._version, self._version_path = self._get_version()
+        self._version_mtime = _mtime(self._version_path)
+        return self._version
+
+    @property
+    def venv_python(self) -> str:
+        """Return the path to the environment's Python executable."""
+        if self._venv_python is None:
+            self._venv_python = self._get_venv_python()
+        return self._venv_python
+
+    def _get_version(self) -> tuple[str, Path]:
+        """Return the version and the path whose mtime it depends on."""
+        site_packages = Path(self.dir).parent
+        try:
+            entry_names = os.listdir(site_packages)
+        except OSError:
+            entry_names = []
+        versions = dist_info_versions(site_packages, entry_names)
+        if version := versions.get(normalize_name(Path(self.dir).name)):
+            return version, site_packages
+        return self._get_file_version(), Path(self.dir, '_version.py')
+
+    def _get_file_version(self) -> str:
         version_re = r'[0-9]{1,}.[0-9]{1,}.[0-9]{1,}'
         path = Path(self.dir, '_version.py')
         try:
@@ -124,11 +203,57 @@ class EnvironmentVersion():
             source_dir = Path(*parts[:index])
             return os.path.join(source_dir, '.venv', 'bin', 'python')
         if '.pyenv' in parts:
-            index = parts.index('versions')
-            source_dir = Path(*parts[:index+2])
-            return os.path.join(source_dir, 'bin', 'python')
+            index = parts.index('versions') + 2
+            if parts[index:index + 1] == ('envs',):
+                # A virtualenv: versions/<version>/envs/<env>
+                index += 2
+            return os.path.join(Path(*parts[:index]), 'bin', 'python')
         return ''
 
+    def record(self) -> dict[str, tuple[str, int]] | None:
+        """Return {path: (sha256, size)} for the installed files.
+
+        The paths are relative to dir and the sha256 is a hex digest, as
+        written by the installer in the dist-info RECORD. Files recorded
+        without a hash (e.g. byte-code) are left out. Returns None if the
+        install has no RECORD.
+        """
+        record_path = self.record_path()
+        if not record_path:
+            return None
+        prefix = f'{Path(self.dir).name}/'
+        record = {}
+        try:
+            with open(record_path, 'r',
+                      encoding='utf8', newline='') as f_record:
+                for row in csv.reader(f_record):
+                    if len(row) != 3 or not row[0].startswith(prefix):
+                        continue
+                    path, hash_text, size = row
+                    algorithm, _, digest = hash_text.partition('=')
+                    if algorithm != 'sha256':
+                        continue
+                    record[path[len(prefix):]] = (
+                        _hex_digest(digest),
+                        int(size) if size.isdigit() else -1)
+        except OSError:
+            return None
+        return record
+
+    def record_path(self) -> Path | None:
+        """Return the path of the install's RECORD, or None."""
+        site_packages = Path(self.dir).parent
+        name = normalize_name(Path(self.dir).name)
+        try:
+            entry_names = sorted(os.listdir(site_packages))
+        except OSError:
+            return None
+        for entry_name in entry_names:
+            if (entry_name.endswith(DIST_INFO)
+                    and normalize_name(entry_name.split('-')[0]) == name):
+                return Path(site_packages, entry_name, RECORD)
+        return None
+
     @property
     def dir_short(self) -> str:
         """Property method to return a shortened directory path."""
@@ -137,3 +262,53 @@ class EnvironmentVersion():
     @staticmethod
     def _short_dir(long_dir: str) -> str:
         return long_dir.replace(str(Path.home()), '~')
+
+
+def normalize_name(name: str) -> str:
+    """Return a distribution name as it appears in a dist-info name."""
+    return re.sub(r'[-_.]+', '_', name).lower()
+
+
+def dist_info_versions(
+        site_packages: str, entry_names: Iterable[str]) -> dict[str, str]:
+    """Return {normalized name: version} for the dist-info entries.
+
+    The version is taken from the `<name>-<version>.dist-info` directory
+    name; METADATA is only read if the name does not carry one.
+    """
+    versions = {}
+    for entry_name in entry_names:
+        if not entry_name.endswith(DIST_INFO):
+            continue
+        name, _, version = entry_name[:-len(DIST_INFO)].partition('-')
+        if not version:
+            version = _metadata_version(Path(site_packages, entry_name))
+        if version:
+            versions[normalize_name(name)] = version
+    return versions
+
+
+def _metadata_version(dist_info: Path) -> str:
+    try:
+        with open(Path(dist_info, METADATA), 'r', encoding='utf8') as f_meta:
+            for line in f_meta:
+                if line.startswith('Version:'):
+                    return line.split(':', 1)[1].strip()
+                if not line.strip():
+                    break
+    except OSError:
+        pass
+    return ''
+
+
+def _hex_digest(digest: str) -> str:
+    """Return a RECORD (urlsafe base64, unpadded) digest as hex."""
+    padding = '=' * (-len(digest) % 4)
+    return base64.urlsafe_b64decode(digest + padding).hex()
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
@@ -9,7 +9,7 @@ from psiutils.constants import PAD, PADB
 from psiutils.utilities import window_resize, geometry, notify
 from psiutils.buttons import ButtonFrame, IconButton
 
-from package.compare import compare
+from package.compare import compare_env, invalidate
 from package.config import read_config
 from package.projects import Project
 from package.env_version import EnvironmentVersion
@@ -134,8 +134,10 @@ class CompareFrame():
 
     def compare_project(self) -> None:
         """Destroy and recreate widgets based on comparison."""
-        (missing, mismatches) = compare(
-            self.project.source_dir, self.env_version.dir)
+        # The installed files themselves, so files synced in the diff
+        # viewer compare equal at once.
+        (missing, mismatches) = compare_env(
+            self.project.source_dir, self.env_version, mode='files')
 
         for item in self.destroy_widgets:
             item.destroy()
@@ -271,6 +273,7 @@ class CompareFrame():
             print(f'{source=}')
             print(f'{destination=}')
             shutil.copyfile(source, destination)
+        invalidate(destination)
         notify(FRAME_TITLE, f'Item {file_name} copied')
 
         for widget in self.missing_file_frame.winfo_children():
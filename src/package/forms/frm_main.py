@@ -11,6 +11,7 @@ from psiutils.menus import Menu, MenuItem
 from psiutils.utilities import window_resize, geometry
 
 from package.projects import ProjectServer
+from package.watcher import WatchService
 from package.config import read_config
 from package.build import UV_PUBLISH_TOKEN
 from package.text import Text
@@ -51,6 +52,11 @@ class MainFrame():
         self.projects = self.project_server.projects
         self.project = None
 
+        # pylint: disable=no-member
+        self.watch_interval = self.config.watch_interval
+        self.watch_service = WatchService(
+            self.project_server, interval=self.watch_interval / 1000)
+
         self.tree = None
         self.build_button = None
         self.compare_button = None
@@ -94,6 +100,18 @@ class MainFrame():
 
         self.context_menu = self._context_menu()
 
+        root.after_idle(self.project_server.prefetch)
+        root.after_idle(self._start_watching)
+
+    def _start_watching(self) -> None:
+        self.watch_service.start()
+        self.root.after(self.watch_interval, self._poll_watch_service)
+
+    def _poll_watch_service(self) -> None:
+        """Pass the projects changed on disk (found by the worker) on."""
+        self.watch_service.poll()
+        self.root.after(self.watch_interval, self._poll_watch_service)
+
     def _main_frame(self, master: tk.Frame) -> ttk.Frame:
         frame = ttk.Frame(master)
         frame.rowconfigure(0, weight=1)
@@ -355,4 +373,5 @@ class MainFrame():
         self.root.wait_window(dlg.root)
 
     def _dismiss(self, *args) -> None:
+        self.watch_service.stop()
         self.root.destroy()
@@ -9,9 +9,10 @@ and integrates build and compare workflows via modular frames.
 
 Intended for use within the PSI package build system.
 """
-import os
+import queue
 import subprocess
 import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
 from tkinter import ttk, messagebox
 from pathlib import Path
 
@@ -21,7 +22,8 @@ from psiutils.utilities import window_resize, geometry
 
 from package.projects import Project
 from package.config import read_config
-from package.compare import compare
+from package.compare import compare_async
+from package.digest_cache import digest_cache
 from package.build import UV_PUBLISH_TOKEN
 from package import logger
 
@@ -33,6 +35,9 @@ FRAME_TITLE = 'Project compare versions'
 DEFAULT_DEV_DIR = str(Path(Path.home(), '.pyenv', 'versions'))
 DEFAULT_PROJECT_DIR = str(Path(Path.home(), 'projects'))
 
+# ms between checks for scan and compare results
+RESULT_POLL_INTERVAL = 50
+
 
 class ProjectVersionsFrame():
     """
@@ -69,8 +74,11 @@ class ProjectVersionsFrame():
         _main_frame(master): Creates the main layout frame with widgets.
         _versions_frame(master): Creates the container for version options.
         _button_frame(master): Sets up action buttons.
-        _populate_versions_frame(): Fills the versions frame with radio buttons
+        _populate_versions_frame(): Starts the environment scan (if a
+            refresh is due) and the compares on a worker pool.
+        _show_versions(): Fills the versions frame with radio buttons
             and version info.
+        _show_compare(): Restyles a radio button as its compare arrives.
         _values_changed(*args): Enables/disables buttons based on
             field changes.
         _compare_project(): Launches comparison window for selected version.
@@ -89,12 +97,23 @@ class ProjectVersionsFrame():
         self.mode = mode
         self.project = project
         self.project_server = parent.project_server
+        self.watch_service = parent.watch_service
         self.save_button = None
         self.versions_frame = None
         self.button_frame = None
         self.canvas = None
         self.canvas_frame = None
         self.canvas_frame_id = None
+        # pylint: disable=no-member
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.scan_workers)
+        self.results = queue.Queue()
+        self.version_buttons: dict[str, ttk.Radiobutton] = {}
+        # Scan and compare results still to arrive
+        self.results_pending = 0
+        self.polling = False
+        # Results of superseded populate passes are dropped.
+        self.generation = 0
 
         if not project.cached_envs:
             refresh = True
@@ -124,6 +143,7 @@ class ProjectVersionsFrame():
         self._show()
 
         self._populate_versions_frame()
+        self.watch_service.subscribe(self._watched_change)
 
     def _show(self) -> None:
         """
@@ -213,7 +233,6 @@ class ProjectVersionsFrame():
         self.canvas.configure(yscrollcommand=v_scroll.set)
         self.canvas_frame_id = self.canvas.create_window(
             (4, 4), window=self.canvas_frame, anchor=tk.NW)
-        self._populate_versions_frame()
         return frame
 
     def _on_canvas_configure(self, event):
@@ -242,49 +261,149 @@ class ProjectVersionsFrame():
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def _populate_versions_frame(self) -> None:
-        self.project.env_versions = self.project.get_versions(self.refresh)
-        if self.refresh:
-            self.project_server.save_projects()
+        for widget in self.canvas_frame.winfo_children():
+            widget.destroy()
+        self.generation += 1
+        self.version_buttons = {}
+        self.results_pending = 0
+
+        if not self.refresh:
+            self._show_versions(self.project.get_versions())
+            return
+
+        # Scan on the pool; the result is shown by _poll_results.
         self.refresh = False
+        label = ttk.Label(self.canvas_frame, text='Finding environments…')
+        label.grid(row=0, column=0, sticky=tk.W)
+        self._queue_result(
+            None, self.executor.submit(self.project.scan_versions))
+        self._start_polling()
+
+    def _versions_found(self, future: Future) -> None:
         for widget in self.canvas_frame.winfo_children():
             widget.destroy()
-        versions = self.project.env_versions
+        if error := future.exception():
+            logger.warning(
+                "Environment scan failed",
+                project=self.project.name,
+                error=str(error),
+            )
+            label = ttk.Label(
+                self.canvas_frame, text='Environment scan failed')
+            label.grid(row=0, column=0, sticky=tk.W)
+            return
+
+        (self.project.cached_envs,
+         self.project.scan_incomplete) = future.result()
+        self.project_server.save_projects()
+        self._show_versions(self.project.cached_envs)
+
+    def _show_versions(self, versions: dict) -> None:
+        self.project.env_versions = versions
         for row, name in enumerate(sorted(list(versions))):
             version = versions[name]
-            style = ''
-            (missing, mismatches) = compare(self.project.source_dir,
-                                            version.dir)
-            style = ''
-            mismatch_str = ''
-            style = 'green-fg.TRadiobutton'
-            missing_files = []
-            for count, item in enumerate(missing):
-                if count < 5:
-                    if item[0]:
-                        missing_files.append(item[0])
-
-                    if item[1]:
-                        missing_files.append(item[1])
-
-            if missing or mismatches:
-                style = 'red-fg.TRadiobutton'
-                # style.config('width', 500)
-                if '_version.py' in mismatches:
-                    mismatches.remove('_version.py')
-                mismatch_str = ' '.join(mismatches + missing_files)
-                if len(mismatch_str) > 50:
-                    mismatch_str = f'{mismatch_str[:50]} ...'
-            display_text = (f'{name} : ({version.version}) '
-                            f'{mismatch_str}')
-
             button = ttk.Radiobutton(
                 self.canvas_frame,
-                text=display_text,
+                text=f'{name} : ({version.version}) checking…',
                 variable=self.version,
                 value=version.name,
-                style=style,
             )
             button.grid(row=row, column=0, sticky=tk.W)
+            self.version_buttons[version.name] = button
+
+        if self.project.scan_incomplete:
+            label = ttk.Label(
+                self.canvas_frame,
+                text='Scan time budget exceeded: environments may be missing',
+                style='red-fg.TLabel')
+            label.grid(row=len(versions), column=0, sticky=tk.W)
+
+        futures = compare_async(
+            self.project.source_dir, versions.values(), self.executor)
+        for env_name, future in futures.items():
+            self._queue_result(env_name, future)
+        self._start_polling()
+
+    def _queue_result(self, env_name: str | None, future: Future) -> None:
+        """Queue future when done; env_name None marks the env scan."""
+        self.results_pending += 1
+        future.add_done_callback(
+            lambda future, generation=self.generation:
+            self.results.put((generation, env_name, future)))
+
+    def _start_polling(self) -> None:
+        if self.results_pending and not self.polling:
+            self.polling = True
+            self.root.after(RESULT_POLL_INTERVAL, self._poll_results)
+
+    def _poll_results(self) -> None:
+        """Show the results that have arrived (on the Tk thread)."""
+        if not self.root.winfo_exists():
+            return
+        while True:
+            try:
+                generation, env_name, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            self.results_pending -= 1
+            if env_name is None:
+                self._versions_found(future)
+            else:
+                self._show_compare(env_name, future)
+
+        if self.results_pending:
+            self.root.after(RESULT_POLL_INTERVAL, self._poll_results)
+        else:
+            self.polling = False
+            digest_cache().save()
+
+    def _show_compare(self, env_name: str, future: Future) -> None:
+        version = self.project.env_versions[env_name]
+        button = self.version_buttons[env_name]
+        if error := future.exception():
+            logger.warning(
+                "Compare failed",
+                project=self.project.name,
+                env=env_name,
+                error=str(error),
+            )
+            button.configure(
+                text=f'{env_name} : ({version.version}) compare failed',
+                style='red-fg.TRadiobutton')
+            return
+
+        (missing, mismatches) = future.result()
+        mismatch_str = ''
+        style = 'green-fg.TRadiobutton'
+        missing_files = []
+        for count, item in enumerate(missing):
+            if count < 5:
+                if item[0]:
+                    missing_files.append(item[0])
+
+                if item[1]:
+                    missing_files.append(item[1])
+
+        if missing or mismatches:
+            style = 'red-fg.TRadiobutton'
+            if '_version.py' in mismatches:
+                mismatches.remove('_version.py')
+            mismatch_str = ' '.join(mismatches + missing_files)
+            if len(mismatch_str) > 50:
+                mismatch_str = f'{mismatch_str[:50]} ...'
+        display_text = (f'{env_name} : ({version.version}) '
+                        f'{mismatch_str}')
+        button.configure(text=display_text, style=style)
+
+    def _watched_change(self, projects: set[str]) -> None:
+        """Show current drift when the project or its envs change."""
+        if not self.root.winfo_exists():
+            self.watch_service.unsubscribe(self._watched_change)
+            return
+        if self.project.name in projects:
+            self._populate_versions_frame()
 
     def _on_mouse_wheel(self, event):
         if event.num == 4:   # Linux scroll up
@@ -360,15 +479,8 @@ class ProjectVersionsFrame():
 
     def _get_venv_python(self) -> str:
         env_version = self.project.env_versions[self.version.get()]
-        parts = Path(env_version.dir).parts
-        if '.venv' in parts:
-            index = parts.index('.venv')
-            source_dir = Path(*parts[:index])
-            return os.path.join(source_dir, '.venv', 'bin', 'python')
-        if '.pyenv' in parts:
-            index = parts.index('versions')
-            source_dir = Path(*parts[:index+2])
-            return os.path.join(source_dir, 'bin', 'python')
+        if env_version.venv_python:
+            return env_version.venv_python
 
         messagebox.showerror('', 'Virtualenv not found')
         return ''
@@ -400,4 +512,6 @@ class ProjectVersionsFrame():
 
         Typically bound to an exit button or key event to _dismiss the frame.
         """
+        self.watch_service.unsubscribe(self._watched_change)
+        self.executor.shutdown(wait=False, cancel_futures=True)
         self.root.destroy()
@@ -1,8 +1,8 @@
 """SearchFrame for <application>."""
-import os
-import re
-from pathlib import Path
+import queue
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk
 from clipboard import copy
 
@@ -12,9 +12,18 @@ from psiutils.utilities import window_resize, geometry
 
 from package.constants import APP_TITLE
 from package.config import read_config
+from package.search import SearchQuery, Hit, line_hits, symbol_hits
+from package.hit_buffer import HitBuffer
+from package import logger
 
 FRAME_TITLE = f'{APP_TITLE} - Search for content'
 
+# ms between checks for search results
+RESULT_POLL_INTERVAL = 50
+
+# Most results written to the list per check, so the window stays live
+RESULT_BATCH_SIZE = 200
+
 
 class SearchFrame():
     """
@@ -22,11 +31,12 @@ class SearchFrame():
 
     Args:
         parent: The parent window.
+        query: Initial query; if it has text the search starts at once.
 
     Returns:
         None
     """
-    def __init__(self, parent: tk.Frame, search_term: str = '') -> None:
+    def __init__(self, parent: tk.Frame, query: SearchQuery = None) -> None:
         self.root = tk.Toplevel()
         self.parent = parent
         self.config = read_config()
@@ -35,20 +45,41 @@ class SearchFrame():
 
         self.search_button = None
         self.copy_button = None
+        self.cancel_button = None
         self.found_list = None
-        self.found = []
+        self.query = None
+        self.hits = HitBuffer()
+        # Exception raised by the current search, if it failed
+        self.search_error = None
+
+        # The search runs on a worker; results are queued for the Tk thread.
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='search')
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.searching = False
+        self.polling = False
+        # Results from an earlier (cancelled) search are ignored.
+        self.generation = 0
 
         # tk variables
+        query = query or SearchQuery('')
         self.search_text = tk.StringVar()
-        self.file_type = tk.StringVar(value='py')
-        self.match_case = tk.BooleanVar()
-        self.match_whole_word = tk.BooleanVar()
+        self.file_type = tk.StringVar(
+            value='py' if query.suffix == '.py' else 'all')
+        self.match_case = tk.BooleanVar(value=query.match_case)
+        self.match_whole_word = tk.BooleanVar(value=query.whole_word)
+        self.multi = tk.BooleanVar(value=query.multi)
+        self.find_usages = tk.BooleanVar(value=query.find_usages)
+        self.progress = tk.StringVar()
 
         self.search_text.trace_add('write', self._check_value_changed)
 
         self._show()
 
-        self.search_text.set(search_term)
+        self.search_text.set(query.text)
+        if query.text:
+            self.root.after_idle(self._start_process)
 
     def _show(self) -> None:
         root = self.root
@@ -93,6 +124,10 @@ class SearchFrame():
         self.found_list.grid(row=row, column=0, columnspan=2, sticky=tk.NSEW)
         self.found_list.insert('0.0', '')
 
+        row += 1
+        label = ttk.Label(frame, textvariable=self.progress)
+        label.grid(row=row, column=0, columnspan=2, sticky=tk.W)
+
         return frame
 
     def _options_frame(self, master: tk.Frame) -> tk.Frame:
@@ -109,6 +144,17 @@ class SearchFrame():
             frame, text='Match whole word', variable=self.match_whole_word)
         check_button.grid(row=row, column=0, sticky=tk.W)
 
+        row += 1
+        check_button = ttk.Checkbutton(
+            frame, text='Several terms', variable=self.multi)
+        check_button.grid(row=row, column=0, sticky=tk.W)
+
+        row += 1
+        check_button = ttk.Checkbutton(
+            frame, text='Find usages (Python names)',
+            variable=self.find_usages)
+        check_button.grid(row=row, column=0, sticky=tk.W)
+
         # File options
         row = 0
         button = ttk.Radiobutton(
@@ -136,9 +182,12 @@ class SearchFrame():
             frame, 'Search', 'search', self._start_process, True)
         self.copy_button = IconButton(
             frame, 'Copy', 'copy_clipboard', self._copy, True)
+        self.cancel_button = IconButton(
+            frame, 'Cancel', 'close', self._cancel, True)
         frame.buttons = [
             self.search_button,
             self.copy_button,
+            self.cancel_button,
             frame.icon_button('exit', self._dismiss),
         ]
         frame.enable(False)
@@ -149,69 +198,140 @@ class SearchFrame():
         self.search_button.enable(enable)
 
     def _start_process(self, *args) -> None:
+        self._cancel()
+        self.generation += 1
+        self.cancelled = threading.Event()
+        self.hits = HitBuffer()
+        self.search_error = None
         self.copy_button.disable()
         self.found_list.delete('0.0', tk.END)
-        self.found = [
-            project.name
-            for project in self.projects.values()
-            if self._parse_project(project.base_dir)
-        ]
-        self.found_list.insert('0.0', '\n'.join(sorted(self.found)))
-        print(f'{self.found=}')
-        if self.found:
-            self.copy_button.enable()
+
+        query = self.query = self._query()
+        projects = {name: project.base_dir
+                    for name, project in self.projects.items()}
+        self.searching = True
+        self.cancel_button.enable()
+        self.progress.set('Searching…')
+        self.executor.submit(
+            self._search, query, projects, self.generation, self.cancelled)
+        if not self.polling:
+            self.polling = True
+            self.root.after(RESULT_POLL_INTERVAL, self._poll_results)
+
+    def _search(
+            self,
+            query: SearchQuery,
+            projects: dict,
+            generation: int,
+            cancelled: threading.Event) -> None:
+        """Queue the hits for query (on the worker thread)."""
+        # pylint: disable=no-member
+        limit = self.config.search_max_hits
+        try:
+            if query.is_symbol:
+                results = symbol_hits(query, projects, limit, cancelled)
+            else:
+                results = line_hits(
+                    query, projects, self.config.search_hits_per_file,
+                    limit, cancelled)
+            for result in results:
+                self.results.put((generation, result))
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(
+                "Search failed",
+                text=query.text,
+                error=str(error),
+            )
+            # An exception marks a failed search.
+            self.results.put((generation, error))
+        finally:
+            # None marks the end of the search.
+            self.results.put((generation, None))
+
+    def _poll_results(self) -> None:
+        """Show the search results that have arrived (on the Tk thread)."""
+        if not self.root.winfo_exists():
+            return
+        lines = []
+        finished = False
+        while len(lines) < RESULT_BATCH_SIZE:
+            try:
+                generation, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            if result is None:
+                finished = True
+                break
+            if isinstance(result, Exception):
+                self.search_error = result
+                continue
+            lines.append(self._add_result(result))
+
+        if lines:
+            self.found_list.insert(tk.END, '\n'.join(lines) + '\n')
+            self.progress.set(f'Searching… {len(self.hits)} found')
+        if finished:
+            self._search_finished()
+
+        if self.searching:
+            self.root.after(RESULT_POLL_INTERVAL, self._poll_results)
         else:
-            self.found_list.insert('0.0', 'No items found')
-
-    def _parse_project(self, search_dir: str) -> bool:
-        found = False
-        for directory_name, subdir_list, file_list in os.walk(search_dir):
-            del subdir_list
-            if not self._ignore_path(directory_name):
-                for file_name in file_list:
-                    path = Path(directory_name, file_name)
-                    if self.file_type.get() == 'py':
-                        if file_name.endswith('.py'):
-                            found = self._contains_search_text(path)
-                    else:
-                        found = self._contains_search_text(path)
-                    if found:
-                        return True
-        return False
-
-    def _contains_search_text(self, path: str) -> bool:
-        with open(path, 'r', encoding='utf-8') as f_test:
-            file_text = f_test.read()
-
-        search = self.search_text.get()
-        if not self.match_case.get():
-            search = search.lower()
-        search_re = rf'\b{re.escape(search)}\b'
-
-        if not self.match_case.get() and not self.match_whole_word.get():
-            return search in file_text.lower()
-
-        if self.match_case.get() and not self.match_whole_word.get():
-            return search in file_text
-
-        if not self.match_case.get() and self.match_whole_word.get():
-            return re.findall(search_re, file_text.lower())
-
-        if self.match_case.get() and self.match_whole_word.get():
-            return re.findall(search_re, file_text)
-
-        return False
-
-    def _ignore_path(self, path: str) -> bool:
-        ignore = [
-            '.venv',
-            '.git',
-            '__pycache__',
-        ]
-        return any(item in path for item in ignore)
+            self.polling = False
+
+    def _query(self) -> SearchQuery:
+        """Return the query defined by the form (read once per search)."""
+        return SearchQuery(
+            text=self.search_text.get(),
+            match_case=self.match_case.get(),
+            whole_word=self.match_whole_word.get(),
+            suffix='.py' if self.file_type.get() == 'py' else '',
+            multi=self.multi.get(),
+            find_usages=self.find_usages.get(),
+        )
+
+    def _add_result(self, hit: Hit) -> str:
+        """Store hit and return its line for the results list."""
+        self.hits.append(hit)
+        term = f'[{hit.term}] ' if self.query.multi else ''
+        return f'{hit.project}: {hit.path}:{hit.line}: {term}{hit.excerpt}'
+
+    def _search_finished(self, cancelled: bool = False) -> None:
+        self.searching = False
+        self.cancel_button.disable()
+        # pylint: disable=no-member
+        found = f'{len(self.hits)} found'
+        if len(self.hits) >= self.config.search_max_hits:
+            found = f'{found} (limit reached)'
+        if self.query.multi:
+            counts = self.hits.term_counts()
+            found = f'{found} - ' + ', '.join(
+                f'{term}: {counts.get(term, 0)}'
+                for term in self.query.terms)
+        if cancelled:
+            self.progress.set(f'Cancelled: {found}')
+        elif self.search_error:
+            self.progress.set(f'Search failed ({self.search_error}): {found}')
+        else:
+            self.progress.set(found)
+            if not self.hits:
+                self.found_list.insert('0.0', 'No items found')
+        if self.hits:
+            self.copy_button.enable()
+
+    def _cancel(self, *args) -> None:
+        """Stop the search in progress, keeping the results shown so far."""
+        if not self.searching:
+            return
+        self.cancelled.set()
+        self.generation += 1
+        self._search_finished(cancelled=True)
 
     def _copy(self, *args) -> None:
-        copy('\n'.join(sorted(self.found)))
+        copy('\n'.join(self.hits.projects()))
 
     def _dismiss(self, *args) -> None:
+        self.cancelled.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
         self.root.destroy()
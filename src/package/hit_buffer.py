@@ -0,0 +1,92 @@
+"""
+    hit_buffer
+    ==========
+
+    Append-only store for search hits that holds no Python object per hit.
+
+    Excerpts are kept back to back as UTF-8 in one bytearray. Line
+    numbers, excerpt end offsets, file numbers and term numbers are kept
+    in arrays. Each (project, path) and each term is stored once, so
+    tens of thousands of hits cost a few bytes each plus their text.
+
+    Usage Example
+    -------------
+    >>> hits = HitBuffer()
+    >>> for hit in line_hits(query, projects):
+    ...     hits.append(hit)
+    >>> len(hits), hits[0]
+    (1, Hit(project='package', path='src/package/main.py', line=12,
+     excerpt='root.geometry(geometry(config, __file__))',
+     term='geometry'))
+    >>> hits.projects()
+    ['package']
+    >>> hits.term_counts()
+    {'geometry': 1}
+"""
+from array import array
+from typing import Iterator
+
+from package.search import Hit
+
+
+class HitBuffer():
+    """Compact, append-only sequence of Hits."""
+
+    def __init__(self) -> None:
+        self._text = bytearray()
+        # Per hit: end of its excerpt in _text, line, file and term number.
+        self._ends = array('Q')
+        self._lines = array('L')
+        self._file_numbers = array('L')
+        self._term_numbers = array('L')
+        # (project, path) of each file number
+        self._files: list[tuple[str, str]] = []
+        self._numbers: dict[tuple[str, str], int] = {}
+        # term of each term number
+        self._terms: list[str] = []
+        self._term_ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, index: int) -> Hit:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('hit index out of range')
+        start = self._ends[index - 1] if index else 0
+        excerpt = self._text[start:self._ends[index]].decode('utf8')
+        project, path = self._files[self._file_numbers[index]]
+        term = self._terms[self._term_numbers[index]]
+        return Hit(project, path, self._lines[index], excerpt, term)
+
+    def __iter__(self) -> Iterator[Hit]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, hit: Hit) -> None:
+        key = (hit.project, hit.path)
+        number = self._numbers.get(key)
+        if number is None:
+            number = self._numbers[key] = len(self._files)
+            self._files.append(key)
+        term_number = self._term_ids.get(hit.term)
+        if term_number is None:
+            term_number = self._term_ids[hit.term] = len(self._terms)
+            self._terms.append(hit.term)
+        self._text.extend(hit.excerpt.encode('utf8'))
+        self._ends.append(len(self._text))
+        self._lines.append(hit.line)
+        self._file_numbers.append(number)
+        self._term_numbers.append(term_number)
+
+    def projects(self) -> list[str]:
+        """Return the names of the projects with hits, sorted."""
+        return sorted({project for project, _ in self._files})
+
+    def term_counts(self) -> dict[str, int]:
+        """Return the number of hits for each term, in first-hit order."""
+        counts = [0] * len(self._terms)
+        for number in self._term_numbers:
+            counts[number] += 1
+        return dict(zip(self._terms, counts))
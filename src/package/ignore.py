@@ -0,0 +1,258 @@
+"""
+    ignore
+    ======
+
+    One ignore engine for compare, search and import checking.
+
+    Patterns use .gitignore syntax: `*`, `?`, `[...]` and `**`; a leading
+    `/` (or any `/` before the end) anchors a pattern to the tree root; a
+    trailing `/` matches directories only; `!` re-includes. The patterns
+    of a tree are DEFAULT_IGNORE, config item `ignore` and the .gitignore
+    files from the tree root up to its project directory, compiled into a
+    single matcher (or an ordered list if there are `!` patterns).
+
+    `walk` and `iter_files` are scandir walkers that test each entry as
+    it is listed, so ignored directories (`.venv`, `.git`, `dist`,
+    `__pycache__`, ...) are never entered or listed.
+
+    Usage Example
+    -------------
+    >>> rules = tree_rules(project.base_dir)
+    >>> rules.ignored('src/package/__pycache__', is_dir=True)
+    True
+    >>> for directory, subdirs, files in walk(project.base_dir, rules):
+    ...     ...
+"""
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from package.config import config
+
+GITIGNORE = '.gitignore'
+
+# A directory holding one of these is the top of a project; .gitignore
+# files above it are not read.
+PROJECT_MARKERS = ('.git', 'pyproject.toml')
+
+DEFAULT_IGNORE = (
+    '.venv/',
+    '.git/',
+    '__pycache__/',
+    'dist/',
+    'build/',
+    '*.egg-info/',
+    '*.py[co]',
+)
+
+
+class _Rule(NamedTuple):
+    # Matches the path itself (files and directories) or anything below it.
+    regex: str
+    # Matches the path itself if it is a directory (trailing / patterns).
+    dir_regex: str
+    negate: bool
+
+
+class IgnoreRules():
+    """Compiled ignore patterns; paths are relative to the tree root."""
+
+    def __init__(self, patterns: Iterable[str] = ()) -> None:
+        self.patterns = tuple(patterns)
+        rules = [rule for rule in map(_rule, self.patterns) if rule]
+        self._ordered = None
+        if any(rule.negate for rule in rules):
+            # The last matching pattern decides.
+            self._ordered = [
+                (re.compile(rule.regex),
+                 re.compile(rule.dir_regex) if rule.dir_regex else None,
+                 rule.negate)
+                for rule in rules]
+            return
+        self._matcher = _combine(rule.regex for rule in rules)
+        self._dir_matcher = _combine(
+            rule.dir_regex for rule in rules if rule.dir_regex)
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Return True if the root-relative (/-separated) path is ignored."""
+        if self._ordered is None:
+            return bool(
+                (self._matcher and self._matcher.fullmatch(path))
+                or (is_dir and self._dir_matcher
+                    and self._dir_matcher.fullmatch(path)))
+
+        ignored = False
+        for matcher, dir_matcher, negate in self._ordered:
+            if (matcher.fullmatch(path)
+                    or (is_dir and dir_matcher
+                        and dir_matcher.fullmatch(path))):
+                ignored = not negate
+        return ignored
+
+
+def tree_rules(root: str) -> IgnoreRules:
+    """Return the ignore rules for the tree at root."""
+    # pylint: disable=no-member
+    patterns = list(DEFAULT_IGNORE) + list(config.ignore)
+    root = Path(root).absolute()
+    for directory in _gitignore_dirs(root):
+        patterns.extend(_gitignore_patterns(directory, root))
+    return IgnoreRules(patterns)
+
+
+def walk(
+        top: str,
+        rules: IgnoreRules = None
+        ) -> Iterator[tuple[str, list[str], list[str]]]:
+    """Yield as os.walk does, never entering ignored directories.
+
+    Like os.walk, subdirs may be pruned in place and symlinked
+    directories are listed but not followed.
+    """
+    rules = rules or tree_rules(top)
+    directories = [(str(top), '')]
+    while directories:
+        directory, prefix = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs, files, links = [], [], set()
+        for entry in entries:
+            is_dir = entry.is_dir()
+            if rules.ignored(f'{prefix}{entry.name}', is_dir):
+                continue
+            if not is_dir:
+                files.append(entry.name)
+                continue
+            subdirs.append(entry.name)
+            if entry.is_symlink():
+                links.add(entry.name)
+        yield directory, subdirs, files
+
+        directories.extend(
+            (os.path.join(directory, name), f'{prefix}{name}/')
+            for name in reversed(subdirs) if name not in links)
+
+
+def iter_files(
+        top: str,
+        rules: IgnoreRules = None,
+        suffix: str = '') -> Iterator[Path]:
+    """Yield the paths of the files below top that end with suffix."""
+    for directory, subdirs, files in walk(top, rules):
+        del subdirs
+        for name in files:
+            if name.endswith(suffix):
+                yield Path(directory, name)
+
+
+def _gitignore_dirs(root: Path) -> list[Path]:
+    """Return root and its ancestors up to the project dir, top first."""
+    directories = []
+    for directory in (root, *root.parents):
+        directories.append(directory)
+        if any(Path(directory, marker).exists()
+               for marker in PROJECT_MARKERS):
+            return directories[::-1]
+    return [root]
+
+
+def _gitignore_patterns(directory: Path, root: Path) -> list[str]:
+    """Return the patterns of directory/.gitignore, rebased onto root."""
+    try:
+        with open(Path(directory, GITIGNORE), 'r',
+                  encoding='utf8') as f_gitignore:
+            lines = f_gitignore.read().splitlines()
+    except OSError:
+        return []
+
+    prefix = root.relative_to(directory).as_posix()
+    prefix = '' if prefix == '.' else f'{prefix}/'
+    patterns = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = '!' if line.startswith('!') else ''
+        body = line[len(negate):]
+        if not prefix or '/' not in body.rstrip('/'):
+            patterns.append(line)
+            continue
+        # Anchored to the .gitignore directory: re-anchor to root.
+        body = body.lstrip('/')
+        if body.startswith(prefix):
+            patterns.append(f'{negate}/{body[len(prefix):]}')
+        elif body.startswith('**/'):
+            patterns.append(f'{negate}{body}')
+    return patterns
+
+
+def _rule(pattern: str) -> _Rule | None:
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith('#'):
+        return None
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    elif pattern.startswith('\\'):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if not pattern:
+        return None
+
+    anchored = '/' in pattern
+    base = _translate(pattern.lstrip('/'))
+    if not anchored:
+        base = f'(?:.*/)?{base}'
+    if dir_only:
+        return _Rule(f'{base}/.*', base, negate)
+    return _Rule(f'{base}(?:/.*)?', '', negate)
+
+
+def _combine(regexes: Iterable[str]) -> re.Pattern | None:
+    regexes = list(regexes)
+    if not regexes:
+        return None
+    return re.compile('|'.join(f'(?:{regex})' for regex in regexes))
+
+
+def _translate(pattern: str) -> str:
+    """Return a regex for a .gitignore glob."""
+    output = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        index += 1
+        if char == '*':
+            if pattern[index:index + 1] == '*':
+                index += 1
+                if pattern[index:index + 1] == '/':
+                    index += 1
+                    output.append('(?:.*/)?')
+                else:
+                    output.append('.*')
+            else:
+                output.append('[^/]*')
+        elif char == '?':
+            output.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', index + 1)
+            if end < 0:
+                output.append(re.escape(char))
+                continue
+            members = pattern[index:end].replace('\\', '\\\\')
+            if members.startswith('!'):
+                members = f'^{members[1:]}'
+            output.append(f'[{members}]')
+            index = end + 1
+        elif char == '\\' and index < len(pattern):
+            output.append(re.escape(pattern[index]))
+            index += 1
+        else:
+            output.append(re.escape(char))
+    return ''.join(output)
@@ -2,7 +2,7 @@ import tkinter as tk
 from tkinter import messagebox
 
 from psiutils.menus import Menu, MenuItem
-from psiutils.constants import Mode
+from psiutils.constants import Mode, Status
 
 from package.constants import AUTHOR, APP_TITLE
 from package._version import __version__
@@ -52,6 +52,7 @@ class MainMenu():
         return [
             MenuItem(f'{txt.NEW}{txt.ELLIPSIS}', self._new_project),
             MenuItem(f'{txt.SEARCH}{txt.ELLIPSIS}', self._search_for_content),
+            MenuItem(txt.REFRESH_ALL, self._refresh_all),
         ]
 
     def _help_menu_items(self) -> list:
@@ -80,6 +81,19 @@ class MainMenu():
         dlg = SearchFrame(self)
         self.root.wait_window(dlg.root)
 
+    def _refresh_all(self, *args) -> None:
+        result = self.project_server.refresh_all()
+        if result == Status.ERROR:
+            messagebox.showerror('', 'Save failed', parent=self.root)
+            return
+        if self.project_server.scan_incomplete:
+            messagebox.showwarning(
+                '',
+                'Scan time budget exceeded: environments are incomplete',
+                parent=self.root)
+            return
+        messagebox.showinfo('', 'Environments refreshed', parent=self.root)
+
     def _dismiss(self) -> None:
         """Quit the application."""
         self.root.destroy()
@@ -0,0 +1,73 @@
+"""
+    metadata_cache
+    ==============
+
+    Persistent cache of the values derived from each project's
+    `_version.py`, `HISTORY.md` and `pyproject.toml`, stored in DATA_DIR.
+
+    Every value is stored with the (size, mtime_ns) of the file it was
+    read from. A value is used only while that signature still matches,
+    so a warm start costs one stat per file and a single cache read, and
+    only the files that have changed are parsed again.
+
+    Usage Example
+    -------------
+    >>> cache = MetadataCache()
+    >>> version = cache.value(project.version_path, read_version)
+    >>> cache.save()
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+from psiutils.constants import DIALOG_STATUS
+
+from package.constants import DATA_DIR, METADATA_CACHE_FILE
+
+import package.projects_io as io
+
+
+class MetadataCache():
+    """File-derived values with stat-based invalidation."""
+
+    def __init__(self, path: str = '') -> None:
+        self.path = (Path(path) if path
+                     else Path(DATA_DIR, METADATA_CACHE_FILE))
+        # file path -> {'signature': [size, mtime_ns], 'value': ...}
+        self.entries: dict = io.read_json_file(self.path).get('files', {})
+        self.changed = False
+        self._lock = threading.Lock()
+
+    def value(self, path: Path, read: Callable[[], Any]) -> Any:
+        """Return the value derived from path, calling read if it changed."""
+        path = str(path)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self.entries.get(path)
+        if entry and entry['signature'] == signature:
+            return entry['value']
+
+        value = read()
+        with self._lock:
+            self.entries[path] = {'signature': signature, 'value': value}
+            self.changed = True
+        return value
+
+    def save(self) -> int:
+        """Write the cache to DATA_DIR if it has changed."""
+        with self._lock:
+            if not self.changed:
+                return DIALOG_STATUS['ok']
+            output = {'files': dict(self.entries)}
+            self.changed = False
+        return io.update_json_file(self.path, output)
+
+
+def file_signature(path: str) -> list[int] | None:
+    """Return [size, mtime_ns] for path, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
@@ -6,6 +6,7 @@ from package.projects import ProjectServer
 from package.forms.frm_config import ConfigFrame
 # from package.forms.frm_project_versions import ProjectVersionsFrame
 from package.forms.frm_search import SearchFrame
+from package.search import SearchQuery
 
 
 class ModuleCaller():
@@ -47,5 +48,5 @@ class ModuleCaller():
         search_term = ''
         if len(sys.argv) > 2:
             search_term = sys.argv[2]
-        dlg = SearchFrame(self, search_term)
+        dlg = SearchFrame(self, SearchQuery(search_term))
         self.root.wait_window(dlg.root)
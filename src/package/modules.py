@@ -1,9 +1,9 @@
 
-import os
 from pathlib import Path
 import re
 
 from package import logger
+from package.ignore import walk
 
 
 TEST_DIR = '/home/jeff/projects/utilities/package/src/package'
@@ -22,7 +22,7 @@ def check_imports(package: str, source_dir: str) -> None:
 
 def _get_modules(module_dir: str) -> dict:
     modules = {}
-    for directory_name, subdir_list, file_list in os.walk(module_dir):
+    for directory_name, subdir_list, file_list in walk(module_dir):
         del subdir_list
         for file_name in file_list:
             file_path = Path(directory_name, file_name)
@@ -1,27 +1,55 @@
 """Project data for Compare."""
-import os
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import re
 import subprocess
+import threading
+from typing import Any, Callable
 
-from psiutils.constants import DIALOG_STATUS
+from psiutils.constants import DIALOG_STATUS, Status
 from psi_toml.parser import TomlParser
 
 from package import logger
 from package.config import config
 from package.env_version import EnvironmentVersion
+from package.env_index import EnvIndex
+from package.metadata_cache import MetadataCache
 from package.constants import (
     PYPROJECT_TOML, DATA_DIR, HISTORY_FILE, VERSION_FILE, VERSION_TEXT)
 
 import package.projects_io as io
 
 
+class _ProjectData():
+    """Project attribute that is read from the project's files on first use."""
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.attribute = f'_{name}'
+
+    def __get__(self, project, owner=None):
+        if project is None:
+            return self
+        project.load_project_data()
+        return getattr(project, self.attribute)
+
+    def __set__(self, project, value) -> None:
+        setattr(project, self.attribute, value)
+
+
 class Project():
     """Project class to support the package module."""
 
     # base_dir is the base directory containing, e.g. HISTORY.md
 
+    # Derived from _version.py, HISTORY.md and pyproject.toml; loaded by
+    # load_project_data on first access.
+    project_version = _ProjectData()
+    pyproject_version = _ProjectData()
+    history = _ProjectData()
+    new_history = _ProjectData()
+    py_project_missing = _ProjectData()
+
     def __init__(self) -> None:
         """
             Initializes a Projects object.
@@ -43,14 +71,19 @@ class Project():
         self.pyproject_version: str = ''
         self.history = ''
         self.new_history = ''
-        self._pyproject_list = []
         self.env_versions: dict = {}
         self.cached_envs = {}
+        # True if the last scan of cached_envs exceeded its time budget
+        self.scan_incomplete = False
         self.py_project_missing = True
         self._version_text = ''
         self.script: str = ''
         self.pypi = False
         self.build_for_windows = False
+        self.metadata_cache: MetadataCache = None
+        self.env_index: EnvIndex = None
+        self._data_loaded = False
+        self._data_lock = threading.RLock()
 
     def __repr__(self) -> str:
         """
@@ -186,42 +219,65 @@ class Project():
         text = text.replace('"', '')
         return text.replace("'", '')
 
-    def _get_pyproject_version(self) -> str:
+    def _get_pyproject_version(self) -> tuple[str, bool]:
+        """Return the pyproject version and whether the file is missing."""
         default = '-.-.-'
-        self.py_project_missing = False
 
         pyproject_text = io.read_text_file(self.pyproject_path)
         if pyproject_text == DIALOG_STATUS['error']:
-            self.py_project_missing = True
             print(f'pyproject.toml missing {self.pyproject_path}')
-            return default
+            return default, True
 
-        self._pyproject_list = pyproject_text.split('\n')
-        for line in self._pyproject_list:
+        for line in pyproject_text.split('\n'):
             if 'version =' in line:
                 line_list = line.split('=')
                 if len(line_list) != 2:
                     err_str = 'pyproject.toml format error in'
                     print(f'{err_str} {self.pyproject_path}')
-                    return default
-                return self._clean_string(line_list[1])
-        return
+                    return default, False
+                return self._clean_string(line_list[1]), False
+        return None, False
+
+    def _get_history(self) -> str:
+        history = io.read_text_file(self.history_path)
+        if history == DIALOG_STATUS['error']:
+            return ''
+        return history
+
+    def _cached(self, path: Path, read: Callable[[], Any]) -> Any:
+        if self.metadata_cache is None:
+            return read()
+        return self.metadata_cache.value(path, read)
+
+    def load_project_data(self) -> None:
+        """Read the project attributes if they have not been read yet."""
+        with self._data_lock:
+            if not self._data_loaded:
+                self.get_project_data()
 
     def get_project_data(self) -> None:
         """Update project attributes."""
-        self.project_version = self._get_project_version()
-        self.history = io.read_text_file(self.history_path)
-        if self.history == DIALOG_STATUS['error']:
-            self.history = ''
-        self.new_history = self._get_new_history()
-        self.pyproject_version = self._get_pyproject_version()
+        with self._data_lock:
+            # Set first: the attributes below are derived from each other.
+            self._data_loaded = True
+            self.project_version = self._cached(
+                self.version_path, self._get_project_version)
+            self.history = self._cached(self.history_path, self._get_history)
+            # Dated today, so derived afresh rather than cached.
+            self.new_history = self._get_new_history()
+            self.pyproject_version, self.py_project_missing = self._cached(
+                self.pyproject_path, self._get_pyproject_version)
 
     def update_version(self, version: str) -> int:
         output = f'{VERSION_TEXT} = \'{version}\''
         return io.update_file(self.version_path, output)
 
     def update_pyproject_version(self, version: str) -> int:
-        for index, line in enumerate(self._pyproject_list):
+        pyproject_text = io.read_text_file(self.pyproject_path)
+        if pyproject_text == DIALOG_STATUS['error']:
+            return DIALOG_STATUS['error']
+        pyproject_list = pyproject_text.split('\n')
+        for index, line in enumerate(pyproject_list):
             if 'version =' in line:
                 line_list = line.split('=')
                 if len(line_list) != 2:
@@ -229,9 +285,9 @@ class Project():
                     return DIALOG_STATUS['error']
                 version_text = f'{line_list[0].strip()} = "{version}"'
 
-                output = self._pyproject_list[:index]
+                output = pyproject_list[:index]
                 output.append(version_text)
-                output.extend(self._pyproject_list[index+1:])
+                output.extend(pyproject_list[index+1:])
                 break
 
         return io.update_file(self.pyproject_path, '\n'.join(output))
@@ -245,54 +301,21 @@ class Project():
         if not refresh:
             return self.cached_envs
 
-        env_versions = {}  # dict of EnvironmentVersion
-
-        pyenv_dir = Path(Path.home(), '.pyenv', 'versions')
-        pyenv_versions = self._get_versions_from_dir(pyenv_dir)
-
-        venv_dir = Path(Path.home(), 'projects')
-        venv_versions = self._get_versions_from_dir(venv_dir)
-
-        env_versions = {**pyenv_versions, **venv_versions}
+        env_versions, self.scan_incomplete = self.scan_versions()
         self.cached_envs = env_versions
         return env_versions
 
-    def _get_versions_from_dir(self, path: str) -> dict:
-        env_versions = {}  # dict of EnvironmentVersion
+    def scan_versions(
+            self) -> tuple[dict[str, EnvironmentVersion], bool]:
+        """Return the project's environment versions from the env index.
 
-        for directory, subdirs, files in os.walk(path, followlinks=False):
-            del subdirs, files
-            project_name_index, environment_index = 0, 0
-
-            if not Path(directory).is_dir():
-                continue
-
-            parts = Path(directory).parts
-            if '.venv' in parts:
-                start_index = parts.index('.venv')
-                project_name_index = start_index + 4
-                environment_index = start_index - 1
-                python_version_index = start_index + 2
-            elif '.pyenv' in parts:
-                start_index = parts.index('.pyenv')
-                project_name_index = start_index + 6
-                environment_index = start_index + 2
-                python_version_index = start_index + 4
-            else:
-                continue
-
-            if len(parts) <= project_name_index:
-                continue
-
-            if self.name == parts[project_name_index]:
-                environment_name = parts[environment_index]
-                if environment_name not in env_versions:
-                    data = (
-                        environment_name,
-                        directory,
-                        parts[python_version_index])
-                    env_versions[environment_name] = EnvironmentVersion(data)
-        return env_versions
+        Also returns True if the scan exceeded its time budget (some envs
+        may be missing). The project is not changed, so this can run on a
+        worker thread.
+        """
+        env_index = self.env_index or EnvIndex()
+        env_versions = env_index.refresh([self.name])[self.name]
+        return env_versions, env_index.incomplete
 
     def update_pyproject(self) -> int:
         """Create a requirements.txt and update pyproject.tom accordingly."""
@@ -402,7 +425,11 @@ class ProjectServer():
     def __init__(self) -> None:
         # pylint: disable=no-member
         self.project_file = Path(DATA_DIR, config.project_file)
+        self.metadata_cache = MetadataCache()
+        # Shared by the projects, the forms and the WatchService.
+        self.env_index = EnvIndex()
         self.projects = self._get_projects()
+        self.scan_incomplete = False
 
     def _get_projects(self) -> dict[str, Project]:
         project_dict = {}
@@ -410,6 +437,8 @@ class ProjectServer():
         for key, item in projects_raw.items():
             project = Project()
             project.name = key
+            project.metadata_cache = self.metadata_cache
+            project.env_index = self.env_index
             project_dict[key] = project
 
             project.source_dir = item['dir']
@@ -422,9 +451,38 @@ class ProjectServer():
                                    in item['cached_envs'].items()}
             if 'script' in item:
                 project.script = item['script']
-            project.get_project_data()
         return project_dict
 
+    def prefetch(self) -> None:
+        """Load the projects' metadata in the background and cache it."""
+        threading.Thread(target=self._prefetch, daemon=True).start()
+
+    def _prefetch(self) -> None:
+        # pylint: disable=no-member
+        with ThreadPoolExecutor(max_workers=config.scan_workers) as executor:
+            for project in self.projects.values():
+                executor.submit(project.load_project_data)
+        self.metadata_cache.save()
+
+    def refresh_all(self) -> int:
+        """Refresh the cached environments of every project in one scan.
+
+        Returns Status.OK, or Status.ERROR if the projects were not saved.
+        """
+        index = self.env_index.refresh(self.projects)
+        self.scan_incomplete = self.env_index.incomplete
+        for name, project in self.projects.items():
+            project.cached_envs = index[name]
+            project.scan_incomplete = self.scan_incomplete
+        logger.info(
+            "Refreshed environments for all projects",
+            projects=len(self.projects),
+        )
+        # update_json_file returns {} if the file cannot be written.
+        if self.save_projects() == {}:
+            return Status.ERROR
+        return Status.OK
+
     def save_projects(self, projects: dict[str, Project] = None) -> int:
         if not projects:
             projects = self.projects
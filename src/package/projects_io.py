@@ -1,6 +1,8 @@
 """I/O operations for projects.py."""
 from pathlib import Path
 import json
+import os
+import tempfile
 
 from psiutils.constants import DIALOG_STATUS
 from package import logger
@@ -89,3 +91,36 @@ def update_json_file(path: str, output: dict) -> int:
     except NotADirectoryError:
         logger.warning(f'Cannot find directory: {Path(path).parent}')
         return {}
+
+
+def replace_json_file(path: str, output: dict) -> int:
+    """
+    Replace the JSON file with the provided output atomically.
+
+    The output is written to a temporary file in the same directory,
+    which then replaces path, so readers never see a partial file.
+
+    Args:
+        path (str): The path to the JSON file to be replaced.
+        output (dict): The JSON data to write to the file.
+
+    Returns:
+        int: DIALOG_STATUS['ok'], or an empty dictionary if the file
+        cannot be written.
+    """
+    path = Path(path)
+    temp_path = ''
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'w', encoding='utf8', dir=path.parent,
+                prefix=f'.{path.name}.', delete=False) as f_json:
+            temp_path = f_json.name
+            json.dump(output, f_json)
+        os.replace(temp_path, path)
+        return DIALOG_STATUS['ok']
+    except OSError as error:
+        logger.warning(f'Cannot write {path}: {error}')
+        if temp_path:
+            Path(temp_path).unlink(missing_ok=True)
+        return {}
@@ -0,0 +1,254 @@
+"""
+    search
+    ======
+
+    Content search over the registered projects, independent of the GUI.
+
+    A SearchQuery is immutable and is compiled once into a bytes regex.
+    Files are narrowed with the trigram index and then scanned as bytes
+    (memory-mapped if large), so no file is decoded and a non-UTF-8 file
+    cannot stop a search. Case-insensitive matching folds ASCII letters
+    only.
+
+    `line_hits` reports each matching line as a Hit (project, path
+    relative to the project, line number, excerpt), at most
+    config.search_hits_per_file per file and config.search_max_hits per
+    query; a HitBuffer holds them compactly.
+
+    With `multi`, the text holds several terms (separated by spaces or
+    commas). They are compiled into one alternation, so each file is read
+    and scanned once for all of them; only a line that the alternation
+    matches is checked for each term, so terms that overlap (`resize`
+    in `window_resize`) are all found. Every hit records its term.
+
+    With `find_usages`, a (dotted) Python name is looked up in the symbol
+    index instead, which reports where it is imported, defined, called or
+    accessed as an attribute; it is never used for plain text searches.
+
+    A search may be cancelled from another thread by setting the
+    threading.Event passed as `cancelled`; it stops before the next file.
+
+    Usage Example
+    -------------
+    >>> query = SearchQuery('geometry', whole_word=True)
+    >>> next(line_hits(query, {'package': project.base_dir}))
+    Hit(project='package', path='src/package/main.py', line=12,
+        excerpt='root.geometry(geometry(config, __file__))',
+        term='geometry')
+    >>> query = SearchQuery('geometry, window_resize', multi=True)
+    >>> {hit.term for hit in line_hits(query, projects)}
+    {'geometry', 'window_resize'}
+"""
+import mmap
+import os
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from package.config import config
+from package.symbol_index import SymbolIndex, Usage
+from package.trigram_index import TrigramIndex
+
+# Files larger than this are memory-mapped rather than read.
+MMAP_THRESHOLD = 1024 * 1024
+
+# Longest excerpt (in bytes) kept for a hit.
+EXCERPT_SIZE = 200
+
+# A (dotted) Python name, as looked up in the symbol index.
+SYMBOL_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+
+class SearchQuery(NamedTuple):
+    text: str
+    match_case: bool = False
+    whole_word: bool = False
+    # Only files whose names end with suffix are searched ('' for all).
+    suffix: str = '.py'
+    # The text holds several terms, matched in one pass.
+    multi: bool = False
+    # Look the text up in the symbol index rather than scanning files.
+    find_usages: bool = False
+
+    @property
+    def terms(self) -> tuple[str, ...]:
+        """Return the distinct terms of the query, in order."""
+        if not self.multi:
+            return (self.text,)
+        terms = re.split(r'[\s,]+', self.text)
+        return tuple(dict.fromkeys(term for term in terms if term)) or ('',)
+
+    @property
+    def pattern(self) -> re.Pattern:
+        """Return the compiled bytes regex for the query."""
+        return _compile(self)
+
+    @property
+    def is_symbol(self) -> bool:
+        """Return True if the query is answered from the symbol index."""
+        return bool(self.find_usages and not self.multi
+                    and SYMBOL_RE.match(self.text))
+
+
+class Hit(NamedTuple):
+    project: str
+    # Relative to the project's base dir.
+    path: str
+    line: int
+    excerpt: str
+    # The query term found on the line.
+    term: str = ''
+
+
+def line_hits(
+        query: SearchQuery,
+        projects: dict[str, Path],
+        per_file: int = 0,
+        limit: int = 0,
+        cancelled: threading.Event = None) -> Iterator[Hit]:
+    """Yield the lines of projects' files that match query.
+
+    At most per_file lines are reported for a file and limit in all
+    (config.search_hits_per_file and config.search_max_hits by default).
+    """
+    # pylint: disable=no-member
+    per_file = per_file or config.search_hits_per_file
+    limit = limit or config.search_max_hits
+    for project, paths in _candidates(query, projects):
+        base_dir = projects[project]
+        for path in paths:
+            if cancelled and cancelled.is_set():
+                return
+            hits = file_hits(path, query, min(per_file, limit))
+            relative = Path(path).relative_to(base_dir).as_posix()
+            for line, excerpt, term in hits:
+                yield Hit(project, relative, line, excerpt, term)
+            limit -= len(hits)
+            if limit <= 0:
+                return
+
+
+def usages(
+        query: SearchQuery,
+        projects: dict[str, Path],
+        cancelled: threading.Event = None) -> list[Usage]:
+    """Return where the symbol in query is imported, defined or used."""
+    index = SymbolIndex()
+    try:
+        index.update(projects)
+        if cancelled and cancelled.is_set():
+            return []
+        return index.usages(query.text, match_case=query.match_case)
+    finally:
+        index.close()
+
+
+def symbol_hits(
+        query: SearchQuery,
+        projects: dict[str, Path],
+        limit: int = 0,
+        cancelled: threading.Event = None) -> Iterator[Hit]:
+    """Yield the usages of the symbol in query as hits."""
+    # pylint: disable=no-member
+    limit = limit or config.search_max_hits
+    for usage in usages(query, projects, cancelled)[:limit]:
+        relative = Path(usage.path).relative_to(projects[usage.project])
+        yield Hit(usage.project, relative.as_posix(), usage.line,
+                  f'{usage.kind} {usage.name}', query.text)
+
+
+def file_hits(
+        path: Path,
+        query: SearchQuery,
+        limit: int) -> list[tuple[int, str, str]]:
+    """Return (line number, excerpt, term) for up to limit hits.
+
+    A line is reported once for each distinct term found on it.
+    """
+    try:
+        with _contents(path) as contents:
+            return _line_hits(contents, query, limit)
+    except (OSError, ValueError):
+        return []
+
+
+def _candidates(
+        query: SearchQuery,
+        projects: dict[str, Path]) -> list[tuple[str, list[Path]]]:
+    """Return (project, paths) of the files that may match query."""
+    index = TrigramIndex()
+    candidates = {}
+    try:
+        index.update(projects)
+        # A file may match if it may hold any of the terms.
+        for term in query.terms:
+            for project, paths in index.candidates(term).items():
+                candidates.setdefault(project, set()).update(paths)
+    finally:
+        index.close()
+    return [(project, sorted(path for path in candidates[project]
+                             if path.name.endswith(query.suffix)))
+            for project in sorted(candidates)]
+
+
+@contextmanager
+def _contents(path: Path) -> Iterator[bytes | mmap.mmap]:
+    """Yield the contents of path, memory-mapped if it is large."""
+    with open(path, 'rb') as f_contents:
+        if os.fstat(f_contents.fileno()).st_size <= MMAP_THRESHOLD:
+            yield f_contents.read()
+            return
+        with mmap.mmap(f_contents.fileno(), 0,
+                       access=mmap.ACCESS_READ) as contents:
+            yield contents
+
+
+def _line_hits(
+        contents: bytes | mmap.mmap,
+        query: SearchQuery,
+        limit: int) -> list[tuple[int, str, str]]:
+    pattern = query.pattern
+    terms = [(term, query._replace(text=term, multi=False).pattern)
+             for term in query.terms] if query.multi else []
+    hits = []
+    line, counted, position = 1, 0, 0
+    while len(hits) < limit:
+        match = pattern.search(contents, position)
+        if not match:
+            break
+        start = match.start()
+        line += contents[counted:start].count(b'\n')
+        counted = start
+        line_start = contents.rfind(b'\n', 0, start) + 1
+        line_end = contents.find(b'\n', start)
+        if line_end < 0:
+            line_end = len(contents)
+        position = line_end + 1
+
+        text = contents[line_start:line_end]
+        excerpt = text[:EXCERPT_SIZE].decode('utf8', errors='replace')
+        if terms:
+            # Each term on its own, as one may overlap another.
+            found = sorted(
+                (term_match.start(), number, term)
+                for number, (term, term_pattern) in enumerate(terms)
+                if (term_match := term_pattern.search(text)))
+            line_terms = [term for _, _, term in found]
+        else:
+            line_terms = [query.text]
+        for term in line_terms[:limit - len(hits)]:
+            hits.append((line, excerpt.strip(), term))
+    return hits
+
+
+@lru_cache(maxsize=32)
+def _compile(query: SearchQuery) -> re.Pattern:
+    """Return a regex matching any of the terms of query."""
+    text = b'|'.join(re.escape(term.encode('utf8'))
+                     for term in query.terms)
+    if query.whole_word:
+        text = rb'\b(?:' + text + rb')\b'
+    return re.compile(text, 0 if query.match_case else re.IGNORECASE)
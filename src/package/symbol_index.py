@@ -0,0 +1,270 @@
+"""
+    symbol_index
+    ============
+
+    Persistent index of the symbols used and defined in the registered
+    projects' Python files, built with `ast` and stored in DATA_DIR as an
+    SQLite database.
+
+    Every import, definition, call and attribute access is recorded with
+    its line under its fully qualified name, resolved through the file's
+    imports; so after `from psiutils.utilities import geometry`, a call
+    `geometry(...)` is recorded as `psiutils.utilities.geometry`.
+
+    Files are re-parsed only when their sha256 (from the digest cache)
+    changes; queries never read source.
+
+    Usage Example
+    -------------
+    >>> index = SymbolIndex()
+    >>> index.update({'package': project.base_dir})
+    >>> index.usages('psiutils.utilities.geometry', kinds=('call',))
+    [Usage(project='package', path='.../frm_main.py', line=52,
+     kind='call', name='psiutils.utilities.geometry'), ...]
+    >>> index.close()
+"""
+import ast
+import sqlite3
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from package import logger
+from package.constants import DATA_DIR, SYMBOL_INDEX_FILE
+from package.digest_cache import DigestCache, digest_cache
+from package.ignore import iter_files
+
+# Symbol kinds
+IMPORT = 'import'
+DEFINITION = 'def'
+CALL = 'call'
+ATTRIBUTE = 'attribute'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        project TEXT NOT NULL,
+        path TEXT NOT NULL UNIQUE,
+        digest TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS files_project ON files (project);
+    CREATE TABLE IF NOT EXISTS symbols (
+        name TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        file_id INTEGER NOT NULL,
+        line INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+    CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file_id);
+"""
+
+
+class Usage(NamedTuple):
+    project: str
+    path: str
+    line: int
+    kind: str
+    name: str
+
+
+class SymbolIndex():
+    """Symbol index over the Python files of the registered projects."""
+
+    def __init__(self, path: str = '', cache: DigestCache = None) -> None:
+        self.path = Path(path) if path else Path(DATA_DIR, SYMBOL_INDEX_FILE)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache = cache or digest_cache()
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def update(self, projects: dict[str, Path]) -> int:
+        """Re-index the changed files of projects ({name: base dir}).
+
+        Returns the number of files parsed.
+        """
+        cursor = self.connection.cursor()
+        placeholders = ','.join('?' * len(projects))
+        cursor.execute(
+            f'SELECT id FROM files WHERE project NOT IN ({placeholders})',
+            list(projects))
+        self._delete(cursor, [row[0] for row in cursor.fetchall()])
+
+        parsed = 0
+        for name, base_dir in projects.items():
+            parsed += self._update_project(cursor, name, Path(base_dir))
+        self.connection.commit()
+        self.cache.save()
+        if parsed:
+            logger.info(
+                "Symbol index updated",
+                projects=len(projects),
+                files=parsed,
+            )
+        return parsed
+
+    def usages(
+            self,
+            name: str,
+            kinds: Iterable[str] = (),
+            match_case: bool = True) -> list[Usage]:
+        """Return the usages of name, or of any symbol ending in .name."""
+        if match_case:
+            condition = '(symbols.name GLOB ? OR symbols.name GLOB ?)'
+            parameters = [name, f'*.{name}']
+        else:
+            escaped = (name.replace('\\', '\\\\').replace('%', '\\%')
+                       .replace('_', '\\_'))
+            condition = ("(symbols.name LIKE ? ESCAPE '\\' "
+                         "OR symbols.name LIKE ? ESCAPE '\\')")
+            parameters = [escaped, f'%.{escaped}']
+        kinds = list(kinds)
+        if kinds:
+            condition += f" AND kind IN ({','.join('?' * len(kinds))})"
+            parameters += kinds
+        rows = self.connection.execute(
+            f"""SELECT project, path, line, kind, symbols.name
+                FROM symbols JOIN files ON files.id = symbols.file_id
+                WHERE {condition}
+                ORDER BY project, path, line""",
+            parameters)
+        return [Usage(*row) for row in rows]
+
+    def _update_project(
+            self, cursor: sqlite3.Cursor, name: str, base_dir: Path) -> int:
+        cursor.execute(
+            'SELECT path, id, digest FROM files WHERE project = ?', (name,))
+        known = {path: (file_id, digest)
+                 for path, file_id, digest in cursor.fetchall()}
+
+        parsed = 0
+        for path in iter_files(base_dir, suffix='.py'):
+            digest = self.cache.digest(path)
+            file_id, old_digest = known.pop(str(path), (None, None))
+            if not digest or digest == old_digest:
+                continue
+
+            parsed += 1
+            if file_id is not None:
+                self._delete(cursor, [file_id])
+            cursor.execute(
+                'INSERT INTO files (project, path, digest) VALUES (?, ?, ?)',
+                (name, str(path), digest))
+            file_id = cursor.lastrowid
+            cursor.executemany(
+                """INSERT INTO symbols (name, kind, file_id, line)
+                   VALUES (?, ?, ?, ?)""",
+                ((symbol, kind, file_id, line)
+                 for symbol, kind, line in file_symbols(base_dir, path)))
+
+        # Deleted (or newly ignored) since the last update.
+        self._delete(cursor, [item[0] for item in known.values()])
+        return parsed
+
+    @staticmethod
+    def _delete(cursor: sqlite3.Cursor, file_ids: list[int]) -> None:
+        if not file_ids:
+            return
+        cursor.executemany('DELETE FROM symbols WHERE file_id = ?',
+                           ((file_id,) for file_id in file_ids))
+        cursor.executemany('DELETE FROM files WHERE id = ?',
+                           ((file_id,) for file_id in file_ids))
+
+
+def file_symbols(base_dir: Path, path: Path) -> list[tuple[str, str, int]]:
+    """Return (qualified name, kind, line) for the symbols in path."""
+    try:
+        with open(path, 'rb') as f_source:
+            tree = ast.parse(f_source.read(), str(path))
+    except (OSError, SyntaxError, ValueError):
+        return []
+    parts = list(Path(path).relative_to(base_dir).with_suffix('').parts)
+    if parts[:1] == ['src']:
+        parts = parts[1:]
+    is_package = parts[-1:] == ['__init__']
+    if is_package:
+        parts = parts[:-1]
+    package = parts if is_package else parts[:-1]
+
+    visitor = _SymbolVisitor('.'.join(parts), package)
+    visitor.visit(tree)
+    return visitor.symbols
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    """Collect the qualified names used and defined in a module."""
+
+    def __init__(self, module: str, package: list[str]) -> None:
+        self.scope = [module] if module else []
+        self.package = package
+        # local name -> qualified name
+        self.aliases: dict[str, str] = {}
+        self.symbols: list[tuple[str, str, int]] = []
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname:
+                self.aliases[alias.asname] = alias.name
+            else:
+                top_level = alias.name.split('.')[0]
+                self.aliases[top_level] = top_level
+            self._add(alias.name, IMPORT, node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = node.module or ''
+        if node.level:
+            package = self.package[:len(self.package) - node.level + 1]
+            module = '.'.join(package + ([module] if module else []))
+        for alias in node.names:
+            if alias.name == '*':
+                continue
+            name = f'{module}.{alias.name}' if module else alias.name
+            self.aliases[alias.asname or alias.name] = name
+            self._add(name, IMPORT, node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._definition(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self._definition(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._definition(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if name := self._resolve(node.func):
+            self._add(name, CALL, node)
+        else:
+            self.visit(node.func)
+        for argument in [*node.args, *node.keywords]:
+            self.visit(argument)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if name := self._resolve(node):
+            self._add(name, ATTRIBUTE, node)
+        else:
+            self.generic_visit(node)
+
+    def _definition(self, node: ast.AST) -> None:
+        self._add('.'.join(self.scope + [node.name]), DEFINITION, node)
+        for expression in [*node.decorator_list, *getattr(node, 'bases', [])]:
+            self.visit(expression)
+        self.scope.append(node.name)
+        for child in node.body:
+            self.visit(child)
+        self.scope.pop()
+
+    def _resolve(self, node: ast.AST) -> str:
+        """Return the qualified name of a Name/Attribute chain, or ''."""
+        attributes = []
+        while isinstance(node, ast.Attribute):
+            attributes.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return ''
+        base = self.aliases.get(node.id, node.id)
+        return '.'.join([base] + attributes[::-1])
+
+    def _add(self, name: str, kind: str, node: ast.AST) -> None:
+        self.symbols.append((name, kind, node.lineno))
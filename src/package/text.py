@@ -20,6 +20,7 @@ strings = {
     'EDIT_SCRIPT': 'Edit script',
     'KONSOLE': 'Konsole',
     'NOT_IN_PROJECT_DIR': 'Not working in project\'s directory',
+    'REFRESH_ALL': 'Refresh all environments',
     'RUN_SCRIPT': 'Run script',
     'SELECT': 'Select',
 }
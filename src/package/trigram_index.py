@@ -0,0 +1,193 @@
+"""
+    trigram_index
+    =============
+
+    Persistent trigram index of the registered projects' files, stored in
+    DATA_DIR as an SQLite database.
+
+    Each text file is recorded with its (mtime_ns, size) and the set of
+    byte trigrams of its lower-cased contents, each packed into one
+    integer. `update` re-reads only the files whose stat has changed. A
+    search term narrows the files to those holding all of its trigrams;
+    the candidates must still be verified, since the index ignores case
+    and the order of the trigrams.
+
+    Files larger than MAX_INDEXED_SIZE are recorded without trigrams and
+    are candidates for every term. Binary files (containing a NUL byte)
+    are recorded without trigrams, so that they are not read again until
+    they change, and are never candidates.
+
+    Usage Example
+    -------------
+    >>> index = TrigramIndex()
+    >>> index.update({'package': project.base_dir})
+    >>> index.candidates('compare_many')
+    {'package': [PosixPath('.../src/package/compare.py'), ...]}
+    >>> index.close()
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+from package import logger
+from package.constants import DATA_DIR, TRIGRAM_INDEX_FILE
+from package.ignore import iter_files
+
+MAX_INDEXED_SIZE = 1024 * 1024
+
+# files.indexed values
+BINARY = -1
+TOO_LARGE = 0
+INDEXED = 1
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        project TEXT NOT NULL,
+        path TEXT NOT NULL UNIQUE,
+        mtime INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        indexed INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS files_project ON files (project);
+    CREATE TABLE IF NOT EXISTS trigrams (
+        trigram INTEGER NOT NULL,
+        file_id INTEGER NOT NULL,
+        PRIMARY KEY (trigram, file_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id);
+"""
+
+
+class TrigramIndex():
+    """Trigram index over the files of the registered projects."""
+
+    def __init__(self, path: str = '') -> None:
+        self.path = (Path(path) if path
+                     else Path(DATA_DIR, TRIGRAM_INDEX_FILE))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def update(self, projects: dict[str, Path]) -> int:
+        """Re-index the changed files of projects ({name: base dir}).
+
+        Returns the number of files (re-)read.
+        """
+        cursor = self.connection.cursor()
+        placeholders = ','.join('?' * len(projects))
+        cursor.execute(
+            f'SELECT id FROM files WHERE project NOT IN ({placeholders})',
+            list(projects))
+        self._delete(cursor, [row[0] for row in cursor.fetchall()])
+
+        read = 0
+        for name, base_dir in projects.items():
+            read += self._update_project(cursor, name, base_dir)
+        self.connection.commit()
+        if read:
+            logger.info(
+                "Trigram index updated",
+                projects=len(projects),
+                files=read,
+            )
+        return read
+
+    def candidates(self, term: str) -> dict[str, list[Path]]:
+        """Return {project: [paths]} of the files that may contain term."""
+        trigrams = sorted(_trigrams(term.lower().encode('utf8')))
+        if trigrams:
+            placeholders = ','.join('?' * len(trigrams))
+            rows = self.connection.execute(
+                f"""SELECT project, path FROM files WHERE indexed = ?
+                    OR id IN (
+                        SELECT file_id FROM trigrams
+                        WHERE trigram IN ({placeholders})
+                        GROUP BY file_id HAVING COUNT(*) = ?)
+                    ORDER BY project, path""",
+                [TOO_LARGE] + trigrams + [len(trigrams)])
+        else:
+            rows = self.connection.execute(
+                """SELECT project, path FROM files WHERE indexed != ?
+                   ORDER BY project, path""",
+                (BINARY,))
+
+        candidates = {}
+        for project, path in rows:
+            candidates.setdefault(project, []).append(Path(path))
+        return candidates
+
+    def _update_project(
+            self, cursor: sqlite3.Cursor, name: str, base_dir: Path) -> int:
+        cursor.execute(
+            'SELECT path, id, mtime, size FROM files WHERE project = ?',
+            (name,))
+        known = {path: (file_id, mtime, size)
+                 for path, file_id, mtime, size in cursor.fetchall()}
+
+        read = 0
+        for path in iter_files(base_dir):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            path = str(path)
+            file_id, mtime, size = known.pop(path, (None, None, None))
+            if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+                continue
+
+            read += 1
+            if file_id is not None:
+                self._delete(cursor, [file_id])
+            trigrams = _file_trigrams(path, stat.st_size)
+            if trigrams is None:
+                indexed, trigrams = BINARY, set()
+            elif stat.st_size > MAX_INDEXED_SIZE:
+                indexed = TOO_LARGE
+            else:
+                indexed = INDEXED
+            cursor.execute(
+                """INSERT INTO files (project, path, mtime, size, indexed)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (name, path, stat.st_mtime_ns, stat.st_size, indexed))
+            file_id = cursor.lastrowid
+            cursor.executemany(
+                'INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)',
+                ((trigram, file_id) for trigram in trigrams))
+
+        # Deleted (or newly ignored) since the last update.
+        self._delete(cursor, [item[0] for item in known.values()])
+        return read
+
+    @staticmethod
+    def _delete(cursor: sqlite3.Cursor, file_ids: list[int]) -> None:
+        if not file_ids:
+            return
+        cursor.executemany('DELETE FROM trigrams WHERE file_id = ?',
+                           ((file_id,) for file_id in file_ids))
+        cursor.executemany('DELETE FROM files WHERE id = ?',
+                           ((file_id,) for file_id in file_ids))
+
+
+def _file_trigrams(path: str, size: int) -> set[int] | None:
+    """Return the trigrams of a text file, or None if it is binary."""
+    try:
+        with open(path, 'rb') as f_contents:
+            contents = f_contents.read(min(size, MAX_INDEXED_SIZE) + 1)
+    except OSError:
+        return None
+    if b'\0' in contents:
+        return None
+    if size > MAX_INDEXED_SIZE:
+        return set()
+    text = contents.decode('utf8', errors='replace').lower()
+    return _trigrams(text.encode('utf8'))
+
+
+def _trigrams(data: bytes) -> set[int]:
+    """Return the byte trigrams of data packed as integers."""
+    return {(data[index] << 16) | (data[index + 1] << 8) | data[index + 2]
+            for index in range(len(data) - 2)}
@@ -0,0 +1,426 @@
+"""
+    watcher
+    =======
+
+    Watch the environment directories and the projects' source trees so
+    that the env index and the drift shown in the forms stay current
+    without a manual refresh.
+
+    Classes
+    -------
+    DirectoryWatcher
+        Base class: collects the directories in which something changed.
+        `create_watcher` returns an inotify watcher on Linux and a polling
+        watcher elsewhere (or if inotify cannot be initialised).
+
+    WatchService
+        On a worker thread, registers the watches, maps changed
+        directories to projects and refreshes the env index
+        incrementally. `poll`, called from the Tk thread (e.g. via
+        `after`), applies and saves the projects' new envs and tells the
+        listeners which projects have changed.
+"""
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable
+
+from package import logger
+from package.env_index import EnvIndex
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+              | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT = struct.Struct('iIII')
+
+# Byte-code caches are rewritten on import; they are not changes.
+IGNORE_NAMES = {'__pycache__'}
+IGNORE_SUFFIXES = ('.pyc', '.pyo')
+
+# Seconds to wait for the WatchService worker when stopping; after that
+# it is left to end with the process (it is a daemon thread).
+STOP_TIMEOUT = 0.5
+
+
+class DirectoryWatcher(ABC):
+    """Collect the directories in which files have changed."""
+
+    def __init__(self) -> None:
+        self._changed: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @abstractmethod
+    def watch(self, path: str, recursive: bool = False) -> None:
+        """Watch path (and its subdirectories if recursive)."""
+
+    def start(self) -> None:
+        """Start the background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def changes(self) -> set[str]:
+        """Return and clear the directories changed since the last call."""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def _report(self, path: str) -> None:
+        with self._lock:
+            self._changed.add(path)
+
+    @abstractmethod
+    def _run(self) -> None:
+        """Report changes until stopped (on the background thread)."""
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """DirectoryWatcher using the Linux inotify API."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # watch descriptor -> (directory, recursive)
+        self._watches: dict[int, tuple[str, bool]] = {}
+
+    def watch(self, path: str, recursive: bool = False) -> None:
+        if not recursive:
+            self._add_watch(str(path), False)
+            return
+        for directory, subdirs, files in os.walk(path):
+            del files
+            subdirs[:] = [name for name in subdirs
+                          if name not in IGNORE_NAMES]
+            self._add_watch(directory, True)
+
+    def _add_watch(self, path: str, recursive: bool) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            logger.warning(
+                "Cannot watch directory",
+                path=path,
+                error=os.strerror(ctypes.get_errno()),
+            )
+            return
+        with self._lock:
+            self._watches[wd] = (path, recursive)
+
+    def stop(self) -> None:
+        super().stop()
+        os.close(self._fd)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, cookie, length = EVENT.unpack_from(buffer, offset)
+                del cookie
+                start = offset + EVENT.size
+                name = os.fsdecode(buffer[start:start + length].rstrip(b'\0'))
+                offset = start + length
+                self._event(wd, mask, name)
+
+    def _event(self, wd: int, mask: int, name: str) -> None:
+        with self._lock:
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                return
+            if wd not in self._watches:
+                return
+            directory, recursive = self._watches[wd]
+
+        if name in IGNORE_NAMES or name.endswith(IGNORE_SUFFIXES):
+            return
+        self._report(directory)
+
+        new_dir = mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+        if recursive and new_dir:
+            self.watch(os.path.join(directory, name), True)
+
+
+class PollingWatcher(DirectoryWatcher):
+    """DirectoryWatcher that compares stat snapshots at an interval."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        super().__init__()
+        self.interval = interval
+        # path -> recursive
+        self._watches: dict[str, bool] = {}
+        self._snapshots: dict[str, dict] = {}
+
+    def watch(self, path: str, recursive: bool = False) -> None:
+        path = str(path)
+        with self._lock:
+            self._watches[path] = recursive
+        self._snapshots[path] = self._snapshot(path, recursive)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                watches = dict(self._watches)
+            for path, recursive in watches.items():
+                snapshot = self._snapshot(path, recursive)
+                old_snapshot = self._snapshots.get(path, {})
+                for item in snapshot.keys() ^ old_snapshot.keys():
+                    self._report(os.path.dirname(item))
+                for item, stat in snapshot.items():
+                    if item in old_snapshot and old_snapshot[item] != stat:
+                        self._report(
+                            item if stat[2] else os.path.dirname(item))
+                self._snapshots[path] = snapshot
+
+    @staticmethod
+    def _snapshot(path: str, recursive: bool) -> dict[str, tuple]:
+        """Return {path: (mtime_ns, size, is_dir)} for the watched items."""
+        snapshot = {}
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return snapshot
+        snapshot[path] = (stat.st_mtime_ns, 0, True)
+        if not recursive:
+            return snapshot
+
+        for directory, subdirs, files in os.walk(path):
+            subdirs[:] = [name for name in subdirs
+                          if name not in IGNORE_NAMES]
+            for name in subdirs + files:
+                if name.endswith(IGNORE_SUFFIXES):
+                    continue
+                item = os.path.join(directory, name)
+                try:
+                    stat = os.stat(item)
+                except OSError:
+                    continue
+                is_dir = name in subdirs
+                snapshot[item] = (
+                    stat.st_mtime_ns, 0 if is_dir else stat.st_size, is_dir)
+        return snapshot
+
+
+def create_watcher(interval: float = 1.0) -> DirectoryWatcher:
+    """Return an inotify watcher if possible, else a polling watcher."""
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError) as error:
+        logger.info(
+            "inotify unavailable, polling for changes",
+            error=str(error),
+        )
+        return PollingWatcher(interval)
+
+
+class WatchService():
+    """Keep the env index and the projects' drift state live."""
+
+    def __init__(
+            self,
+            project_server,
+            index: EnvIndex = None,
+            interval: float = 1.0) -> None:
+        self.project_server = project_server
+        self.index = index or project_server.env_index
+        self.interval = interval
+        self.listeners: list[Callable[[set[str]], None]] = []
+        self.watcher = None
+        # (changed project names, {project: new envs}), from the worker to
+        # the Tk thread
+        self._changed = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        # Directories whose changes mean the env index is out of date
+        self._env_dirs: set[str] = set()
+        # Set once the worker has registered its watches
+        self.ready = threading.Event()
+
+    def subscribe(self, listener: Callable[[set[str]], None]) -> None:
+        """Call listener with the names of changed projects."""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[set[str]], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self) -> None:
+        """Start the worker that registers watches and applies changes."""
+        self._stop.clear()
+        self.ready.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching without waiting long for the worker.
+
+        The worker may be registering watches or refreshing the env index
+        (which can take up to config.env_scan_budget); it is not waited for
+        beyond STOP_TIMEOUT.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(STOP_TIMEOUT)
+            busy = self._thread.is_alive()
+            self._thread = None
+            if busy:
+                return
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def poll(self) -> set[str]:
+        """Apply the changes found by the worker (on the Tk thread).
+
+        New envs are set on their projects and saved, then the listeners
+        are told which projects have changed. Returns their names.
+        """
+        projects, envs = set(), {}
+        while True:
+            try:
+                names, new_envs = self._changed.get_nowait()
+            except queue.Empty:
+                break
+            projects |= names
+            envs |= new_envs
+
+        if envs:
+            for name, env_versions in envs.items():
+                if project := self.project_server.projects.get(name):
+                    project.cached_envs = env_versions
+            self.project_server.save_projects()
+            projects |= set(envs)
+        if projects:
+            for listener in list(self.listeners):
+                listener(projects)
+        return projects
+
+    def _run(self) -> None:
+        """Watch and apply changes until stopped (on the worker thread)."""
+        self.watcher = create_watcher(self.interval)
+        self._watch_envs()
+        for project in self.project_server.projects.values():
+            if Path(project.source_dir).is_dir():
+                self.watcher.watch(project.source_dir, True)
+        self.watcher.start()
+        self.ready.set()
+
+        while not self._stop.wait(self.interval):
+            projects, envs = self.apply_changes(self.watcher.changes())
+            if projects or envs:
+                self._changed.put((projects, envs))
+
+    def apply_changes(
+            self,
+            changed: set[str]) -> tuple[set[str], dict[str, dict]]:
+        """Refresh the env index if needed (on the worker thread).
+
+        Returns the names of the projects whose source or installed copy
+        changed, and {project: envs} for those whose envs changed; the
+        envs are applied by `poll`.
+        """
+        projects, envs = set(), {}
+        env_changed = False
+        for path in changed:
+            names = self._projects_for(path)
+            projects |= names
+            if not names or path in self._env_dirs:
+                # e.g. a dist-info added or replaced in site-packages
+                env_changed = True
+
+        if env_changed:
+            envs = self._refresh_envs()
+        return projects, envs
+
+    def _projects_for(self, path: str) -> set[str]:
+        """Return the projects whose source or installed copy holds path."""
+        names = set()
+        for name, project in self.project_server.projects.items():
+            dirs = [project.source_dir] + [
+                env_version.dir
+                for env_version in project.cached_envs.values()]
+            if any(project_dir and Path(path).is_relative_to(project_dir)
+                   for project_dir in dirs):
+                names.add(name)
+        return names
+
+    def _refresh_envs(self) -> dict[str, dict]:
+        """Return {project: envs} for the projects whose envs changed.
+
+        A project's envs have changed if it was installed in or removed
+        from an env, or if an installed version changed.
+        """
+        projects = dict(self.project_server.projects)
+        installed = {name: self.index.envs_containing(name)
+                     for name in projects}
+        index = self.index.refresh(projects)
+        changed = {}
+        for name, project in projects.items():
+            old = {key: item.serialize()
+                   for key, item in project.cached_envs.items()}
+            new = {key: item.serialize() for key, item in index[name].items()}
+            if (old != new
+                    or installed[name] != self.index.envs_containing(name)):
+                changed[name] = index[name]
+        self._watch_envs(changed)
+        return changed
+
+    def _watch_envs(self, new_envs: dict[str, dict] = None) -> None:
+        env_dirs = [root.path for root in self.index.scanner.roots]
+        for version_dir in self.index.versions_dirs:
+            env_dirs += [version_dir, str(Path(version_dir, 'envs'))]
+        for records in self.index.roots.values():
+            env_dirs += list(records)
+
+        envs = [project.cached_envs
+                for project in self.project_server.projects.values()]
+        envs += list((new_envs or {}).values())
+        for env_versions in envs:
+            for env_version in env_versions.values():
+                if Path(env_version.dir).is_dir():
+                    self.watcher.watch(env_version.dir, True)
+                # Its site-packages, where the dist-info is replaced
+                env_dirs.append(str(Path(env_version.dir).parent))
+
+        for env_dir in env_dirs:
+            if Path(env_dir).is_dir():
+                self.watcher.watch(env_dir)
+                self._env_dirs.add(str(env_dir))
@@ -0,0 +1,28 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+
+def _install(site_packages: Path, name: str, version: str) -> None:
+    package_dir = Path(site_packages, name)
+    package_dir.mkdir(parents=True)
+    Path(package_dir, '_version.py').write_text(f"__version__ = '{version}'")
+
+
+@pytest.fixture(name='install')
+def fixture_install() -> Callable[[Path, str, str], None]:
+    """Return a function that installs a package in site_packages."""
+    return _install
+
+
+@pytest.fixture(name='make_project')
+def fixture_make_project(tmp_path) -> Callable[[str, dict], Path]:
+    """Return a function that writes {path: bytes} to tmp_path/name."""
+    def make_project(name: str, files: dict[str, bytes]) -> Path:
+        base_dir = Path(tmp_path, name)
+        for path, contents in files.items():
+            Path(base_dir, path).parent.mkdir(parents=True, exist_ok=True)
+            Path(base_dir, path).write_bytes(contents)
+        return base_dir
+    return make_project
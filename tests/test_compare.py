@@ -0,0 +1,220 @@
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from package.compare import _items as items
+from package.compare import (
+    compare, compare_async, compare_env, compare_many, compare_record)
+from package.digest_cache import DigestCache, file_digest
+from package.env_version import EnvironmentVersion
+
+
+def _tree(root: Path, files: dict[str, str]) -> Path:
+    root.mkdir(parents=True)
+    for name, text in files.items():
+        Path(root, name).write_text(text)
+    return root
+
+
+def test_compare_reports_missing_and_mismatched_files(tmp_path):
+    source = _tree(Path(tmp_path, 'src'), {'a.py': 'a', 'b.py': 'b'})
+    env = _tree(Path(tmp_path, 'env'), {'a.py': 'a', 'b.py': 'B', 'c.py': ''})
+    cache = DigestCache(Path(tmp_path, 'digest_cache.json'))
+
+    missing, mismatches = compare(source, env, cache)
+
+    assert missing == [('c.py', '')]
+    assert mismatches == ['b.py']
+
+
+def test_unchanged_files_are_not_read_again(tmp_path, monkeypatch):
+    source = _tree(Path(tmp_path, 'src'), {'a.py': 'a'})
+    env = _tree(Path(tmp_path, 'env'), {'a.py': 'a'})
+    cache_path = Path(tmp_path, 'digest_cache.json')
+    compare(source, env, DigestCache(cache_path))
+
+    def fail(path):
+        raise AssertionError(f'{path} was read')
+
+    monkeypatch.setattr('package.digest_cache.file_digest', fail)
+    assert compare(source, env, DigestCache(cache_path)) == ([], [])
+
+
+def test_source_files_are_read_once_in_files_mode(tmp_path, monkeypatch):
+    source = _tree(Path(tmp_path, 'src', 'alpha'), {'a.py': 'a'})
+    env_versions = []
+    for env, text in (('one', 'a'), ('two', 'b')):
+        env_dir = _tree(
+            Path(tmp_path, env, 'site-packages', 'alpha'), {'a.py': text})
+        env_versions.append(EnvironmentVersion((env, str(env_dir), '3.11')))
+    read = []
+    monkeypatch.setattr('package.digest_cache.file_digest', lambda path: (
+        read.append(path) or file_digest(path)))
+
+    results = compare_many(
+        source, env_versions, DigestCache(Path(tmp_path, 'cache.json')),
+        mode='files')
+
+    assert results['two'] == ([], ['a.py'])
+    assert read.count(str(Path(source, 'a.py'))) == 1
+
+
+def test_binary_files_are_compared(tmp_path):
+    source = Path(tmp_path, 'src')
+    env = Path(tmp_path, 'env')
+    for root, tail in ((source, b'\x00'), (env, b'\x01')):
+        root.mkdir()
+        Path(root, 'data.bin').write_bytes(b'\xff\xfe' * 100_000 + tail)
+        Path(root, 'same.bin').write_bytes(b'\x80' * 10)
+
+    missing, mismatches = compare(
+        source, env, DigestCache(Path(tmp_path, 'digest_cache.json')))
+
+    assert missing == []
+    assert mismatches == ['data.bin']
+
+
+def test_nested_changes_are_reported_by_relative_path(tmp_path):
+    files = {'__init__.py': '', 'frm_main.py': 'main'}
+    source = _tree(Path(tmp_path, 'src', 'forms'), files).parent
+    _tree(Path(source, 'same'), {'a.py': 'a'})
+    env = _tree(Path(tmp_path, 'env', 'forms'), files | {'frm_main.py': 'x'})
+    _tree(Path(env.parent, 'same'), {'a.py': 'a'})
+    Path(env, 'extra.py').write_text('')
+
+    missing, mismatches = compare(
+        source, env.parent, DigestCache(Path(tmp_path, 'cache.json')))
+
+    assert missing == [('forms/extra.py', '')]
+    assert mismatches == ['forms/frm_main.py']
+
+
+def _record_line(path: str, text: str) -> str:
+    digest = base64.urlsafe_b64encode(
+        hashlib.sha256(text.encode()).digest()).rstrip(b'=').decode()
+    return f'{path},sha256={digest},{len(text)}'
+
+
+def test_source_is_checked_against_the_install_record(tmp_path):
+    source = _tree(Path(tmp_path, 'src', 'alpha'), {'a.py': 'a', 'b.py': 'b'})
+    site_packages = Path(tmp_path, 'site-packages')
+    dist_info = Path(site_packages, 'alpha-1.0.0.dist-info')
+    dist_info.mkdir(parents=True)
+    Path(dist_info, 'RECORD').write_text('\n'.join([
+        _record_line('alpha/a.py', 'a'),
+        _record_line('alpha/b.py', 'B'),
+        _record_line('alpha/forms/c.py', 'c'),
+        'alpha/__pycache__/a.cpython-311.pyc,,',
+        'alpha-1.0.0.dist-info/RECORD,,',
+    ]))
+    # The installed files are never read, so need not exist.
+    env_version = EnvironmentVersion(
+        ('tools', str(Path(site_packages, 'alpha')), 'python3.11'))
+
+    missing, mismatches = compare_record(
+        source, env_version.record(),
+        DigestCache(Path(tmp_path, 'cache.json')))
+
+    assert missing == [('forms/c.py', '')]
+    assert mismatches == ['b.py']
+
+
+def test_record_entries_ignored_by_the_source_are_skipped(tmp_path):
+    source = _tree(Path(tmp_path, 'src', 'alpha'),
+                   {'a.py': 'a', '.gitignore': 'generated.py\n'})
+    record = {'a.py': ('', -1), 'generated.py': ('', -1)}
+    cache = DigestCache(Path(tmp_path, 'cache.json'))
+    record['a.py'] = (cache.digest(Path(source, 'a.py')), 1)
+    record['.gitignore'] = (cache.digest(Path(source, '.gitignore')), -1)
+
+    assert compare_record(source, record, cache) == ([], [])
+
+
+def test_source_is_read_once_for_many_envs(tmp_path, monkeypatch):
+    source = _tree(Path(tmp_path, 'src', 'alpha'), {'a.py': 'a'})
+    env_versions = []
+    for env, text in (('one', 'a'), ('two', 'b'), ('three', 'a')):
+        env_dir = _tree(
+            Path(tmp_path, env, 'site-packages', 'alpha'), {'a.py': text})
+        env_versions.append(EnvironmentVersion((env, str(env_dir), '3.11')))
+    listed = []
+    monkeypatch.setattr('package.compare._items', lambda directory, *args: (
+        listed.append(directory) or items(directory, *args)))
+
+    results = compare_many(
+        source, env_versions, DigestCache(Path(tmp_path, 'cache.json')))
+
+    assert {name: result[1] for name, result in results.items()} == {
+        'one': [], 'two': ['a.py'], 'three': []}
+    assert listed.count(source) == 1
+
+
+def test_async_compares_match_compare_many(tmp_path):
+    source = _tree(Path(tmp_path, 'src', 'alpha'), {'a.py': 'a', 'b.py': 'b'})
+    env_versions = []
+    for env, text in (('one', 'a'), ('two', 'b')):
+        env_dir = _tree(
+            Path(tmp_path, env, 'site-packages', 'alpha'),
+            {'a.py': text, 'b.py': 'b'})
+        env_versions.append(EnvironmentVersion((env, str(env_dir), '3.11')))
+    cache = DigestCache(Path(tmp_path, 'cache.json'))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = compare_async(source, env_versions, executor, cache)
+        results = {name: future.result() for name, future in futures.items()}
+
+    assert results == compare_many(source, env_versions, cache)
+    assert results['two'] == ([], ['a.py'])
+
+
+def test_env_results_are_reused_until_a_tree_changes(tmp_path, monkeypatch):
+    source = _tree(Path(tmp_path, 'src', 'alpha'), {'a.py': 'a'})
+    env_dir = _tree(
+        Path(tmp_path, 'env', 'site-packages', 'alpha'), {'a.py': 'b'})
+    env_version = EnvironmentVersion(('env', str(env_dir), '3.11'))
+    cache = DigestCache(Path(tmp_path, 'cache.json'))
+    compare_env(source, env_version, cache)
+    compares = []
+    monkeypatch.setattr('package.compare._Source.compare_dir',
+                        lambda self, env_dir: compares.append(env_dir) or (
+                            [], []))
+
+    assert compare_env(source, env_version, cache) == ([], ['a.py'])
+    assert not compares
+
+    Path(source, 'b.py').write_text('b')
+    compare_env(source, env_version, cache)
+    assert compares == [env_dir]
+
+
+def test_digest_cache_save_drops_deleted_files(tmp_path):
+    source = _tree(Path(tmp_path, 'src'), {'a.py': 'a', 'b.py': 'b'})
+    cache_path = Path(tmp_path, 'data', 'digest_cache.json')
+    cache = DigestCache(cache_path)
+    for name in ('a.py', 'b.py'):
+        cache.digest(Path(source, name))
+    Path(source, 'b.py').unlink()
+
+    cache.save()
+
+    assert list(DigestCache(cache_path).entries) == [
+        str(Path(source, 'a.py'))]
+    assert list(cache_path.parent.iterdir()) == [cache_path]
+
+
+def test_concurrent_digest_cache_saves_leave_a_valid_file(tmp_path):
+    source = _tree(Path(tmp_path, 'src'),
+                   {f'{number}.py': str(number) for number in range(50)})
+    cache_path = Path(tmp_path, 'digest_cache.json')
+    cache = DigestCache(cache_path)
+
+    def digest_and_save(path: Path) -> None:
+        cache.digest(path)
+        cache.save()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(digest_and_save, sorted(source.iterdir())))
+    cache.save()
+
+    assert len(DigestCache(cache_path).entries) == 50
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+
+from package.env_index import EnvIndex, version_key
+
+
+def _site_packages(tmp_path: Path, env: str) -> Path:
+    return Path(tmp_path, '.pyenv', 'versions', env, 'lib', 'python3.11',
+                'site-packages')
+
+
+def _index(tmp_path: Path) -> EnvIndex:
+    return EnvIndex(
+        [Path(tmp_path, '.pyenv', 'versions')],
+        Path(tmp_path, 'data', 'env_index.json'))
+
+
+def test_queries_are_answered_from_the_saved_index(tmp_path, install):
+    install(_site_packages(tmp_path, 'old'), 'alpha', '0.9.1')
+    install(_site_packages(tmp_path, 'new'), 'alpha', '1.2.0')
+    _index(tmp_path).refresh(['alpha'])
+
+    index = _index(tmp_path)
+
+    assert sorted(env.name for env in index.envs_containing('alpha')) == [
+        'new', 'old']
+    assert [env.name for env in index.envs_older_than('alpha', '1.0.0')] == [
+        'old']
+
+
+def test_refresh_relists_only_changed_site_packages(tmp_path, install):
+    site_packages = _site_packages(tmp_path, 'tools')
+    install(site_packages, 'alpha', '1.0.0')
+    index = _index(tmp_path)
+    index.refresh(['alpha', 'beta'])
+    assert index.envs_containing('beta') == []
+
+    install(site_packages, 'beta', '2.0.0')
+    stat = os.stat(site_packages)
+    os.utime(site_packages, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    env_versions = index.refresh(['beta'])
+
+    assert list(env_versions['beta']) == ['tools']
+    assert index.envs_containing('beta')[0].version == '2.0.0'
+
+
+def test_version_key():
+    assert version_key('1.10.0') > version_key('1.9.3')
+    assert version_key('No version file') is None
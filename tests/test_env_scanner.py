@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import Callable
+
+from package.env_scanner import EnvScanner, ScanRoot
+
+
+def _env_roots(tmp_path: Path, install: Callable) -> tuple[Path, Path]:
+    pyenv_dir = Path(tmp_path, '.pyenv', 'versions')
+    install(
+        Path(pyenv_dir, 'tools', 'lib', 'python3.11', 'site-packages'),
+        'alpha', '1.0.0')
+
+    projects_dir = Path(tmp_path, 'projects')
+    site_packages = Path(
+        projects_dir, 'app', '.venv', 'lib', 'python3.12', 'site-packages')
+    install(site_packages, 'alpha', '1.1.0')
+    install(site_packages, 'beta', '0.2.0')
+    return pyenv_dir, projects_dir
+
+
+def test_scan_indexes_every_name_in_one_pass(tmp_path, install):
+    scanner = EnvScanner(_env_roots(tmp_path, install))
+
+    index = scanner.scan(['alpha', 'beta', 'gamma'])
+
+    assert sorted(index['alpha']) == ['app', 'tools']
+    assert list(index['beta']) == ['app']
+    assert index['gamma'] == {}
+    assert index['alpha']['app'].version == '1.1.0'
+    assert index['alpha']['tools'].python_version == 'python3.11'
+
+
+def test_scan_modes_agree(tmp_path, install):
+    roots = _env_roots(tmp_path, install)
+
+    walk_index = EnvScanner(roots, 'walk').scan(['alpha', 'beta'])
+    scandir_index = EnvScanner(roots, 'scandir').scan(['alpha', 'beta'])
+
+    for name, env_versions in walk_index.items():
+        assert ({env: str(item.dir) for env, item in env_versions.items()}
+                == {env: str(item.dir)
+                    for env, item in scandir_index[name].items()})
+
+
+def test_scandir_finds_pyenv_virtualenvs(tmp_path, install):
+    pyenv_dir = Path(tmp_path, '.pyenv', 'versions')
+    install(
+        Path(pyenv_dir, '3.11.7', 'envs', 'tools', 'lib', 'python3.11',
+             'site-packages'),
+        'alpha', '1.0.0')
+
+    index = EnvScanner([pyenv_dir], 'scandir').scan(['alpha'])
+
+    assert list(index['alpha']) == ['tools']
+    assert index['alpha']['tools'].venv_python == str(
+        Path(pyenv_dir, '3.11.7', 'envs', 'tools', 'bin', 'python'))
+
+
+def test_exclusions_and_depth_prune_the_scan(tmp_path, install):
+    projects_dir = Path(tmp_path, 'projects')
+    for parts in (('app',), ('node_modules', 'lib'), ('group', 'deep', 'x')):
+        install(
+            Path(projects_dir, *parts, '.venv', 'lib', 'python3.12',
+                 'site-packages'),
+            'alpha', '1.0.0')
+    root = ScanRoot(str(projects_dir), 2, ('node_modules',))
+
+    index = EnvScanner([root], 'scandir').scan(['alpha'])
+
+    assert list(index['alpha']) == ['app']
+
+
+def test_exhausted_budget_flags_incomplete(tmp_path, install):
+    scanner = EnvScanner(_env_roots(tmp_path, install), 'scandir', budget=1e-9)
+
+    scanner.scan(['alpha'])
+
+    assert scanner.incomplete
+
+
+def test_version_comes_from_dist_info(tmp_path):
+    pyenv_dir = Path(tmp_path, '.pyenv', 'versions')
+    site_packages = Path(
+        pyenv_dir, 'tools', 'lib', 'python3.11', 'site-packages')
+    Path(site_packages, 'alpha').mkdir(parents=True)
+    Path(site_packages, 'alpha-2.3.4.dist-info').mkdir()
+
+    index = EnvScanner([pyenv_dir], 'scandir').scan(['alpha'])
+
+    assert index['alpha']['tools'].version == '2.3.4'
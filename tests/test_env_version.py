@@ -0,0 +1,52 @@
+import builtins
+import os
+from pathlib import Path
+
+import pytest
+
+from package.env_version import EnvironmentVersion
+
+
+def _site_packages(tmp_path: Path, version: str) -> Path:
+    site_packages = Path(tmp_path, 'lib', 'python3.11', 'site-packages')
+    Path(site_packages, 'alpha').mkdir(parents=True)
+    Path(site_packages, f'alpha-{version}.dist-info').mkdir()
+    return site_packages
+
+
+def test_construction_reads_no_files(tmp_path, monkeypatch):
+    site_packages = _site_packages(tmp_path, '1.0.0')
+    data = ('tools', str(Path(site_packages, 'alpha')), 'python3.11')
+
+    def no_io(*args, **kwargs):
+        raise AssertionError('file system accessed')
+
+    with monkeypatch.context() as patch:
+        for module, name in ((os, 'stat'), (os, 'listdir'),
+                             (os, 'scandir'), (builtins, 'open')):
+            patch.setattr(module, name, no_io)
+        env_version = EnvironmentVersion(data, '1.0.0', 1)
+        EnvironmentVersion(data)
+
+    assert env_version.name == 'tools'
+
+
+@pytest.mark.parametrize('offset, expected', [(0, '1.0.0'), (-1, '1.1.0')])
+def test_supplied_version_is_trusted_only_at_its_mtime(
+        tmp_path, offset, expected):
+    site_packages = _site_packages(tmp_path, '1.1.0')
+    mtime = os.stat(site_packages).st_mtime_ns
+    env_version = EnvironmentVersion(
+        ('tools', str(Path(site_packages, 'alpha')), 'python3.11'),
+        '1.0.0',
+        mtime + offset)
+
+    assert env_version.version == expected
+
+
+def test_supplied_version_without_mtime_is_read(tmp_path):
+    site_packages = _site_packages(tmp_path, '1.1.0')
+    env_version = EnvironmentVersion(
+        ('tools', str(Path(site_packages, 'alpha')), 'python3.11'), '1.0.0')
+
+    assert env_version.version == '1.1.0'
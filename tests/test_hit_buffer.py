@@ -0,0 +1,23 @@
+import pytest
+
+from package.hit_buffer import HitBuffer
+from package.search import Hit
+
+
+def test_hit_buffer_round_trip():
+    hits = [
+        Hit('alpha', 'a.py', 2, 'café = 1', 'café'),
+        Hit('alpha', 'a.py', 9, '', 'spam'),
+        Hit('beta', 'b.py', 1, 'geometry_text = 2', 'café'),
+    ]
+    buffer = HitBuffer()
+    for hit in hits:
+        buffer.append(hit)
+
+    assert len(buffer) == 3
+    assert list(buffer) == hits
+    assert buffer[-1] == hits[-1]
+    assert buffer.projects() == ['alpha', 'beta']
+    assert buffer.term_counts() == {'café': 2, 'spam': 1}
+    with pytest.raises(IndexError):
+        buffer[3]  # pylint: disable=pointless-statement
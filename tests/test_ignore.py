@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+
+from package.ignore import IgnoreRules, iter_files, tree_rules, walk
+
+
+def test_patterns_follow_gitignore_syntax():
+    rules = IgnoreRules(['*.log', 'build/', '/docs/*.md', 'a/**/z.py'])
+
+    assert rules.ignored('x/y/debug.log')
+    assert rules.ignored('build', is_dir=True)
+    assert not rules.ignored('build')
+    assert rules.ignored('pkg/build/lib.py')
+    assert rules.ignored('docs/index.md')
+    assert not rules.ignored('src/docs/index.md')
+    assert rules.ignored('a/b/c/z.py')
+    assert rules.ignored('a/z.py')
+
+
+def test_last_matching_pattern_wins():
+    rules = IgnoreRules(['*.py', '!keep.py'])
+
+    assert rules.ignored('drop.py')
+    assert not rules.ignored('src/keep.py')
+
+
+def test_walk_prunes_ignored_dirs_and_honours_gitignore(tmp_path):
+    base_dir = Path(tmp_path, 'project')
+    for path in ('src/package/main.py', 'src/package/generated.py',
+                 'src/package/__pycache__/main.pyc', '.venv/lib/x.py',
+                 '.git/HEAD', 'notes.txt'):
+        Path(base_dir, path).parent.mkdir(parents=True, exist_ok=True)
+        Path(base_dir, path).write_text('')
+    Path(base_dir, 'pyproject.toml').write_text('')
+    Path(base_dir, '.gitignore').write_text(
+        '# comment\n/src/package/generated.py\n*.txt\n')
+    source_dir = Path(base_dir, 'src', 'package')
+
+    found = [Path(directory, name).relative_to(base_dir).as_posix()
+             for directory, _, files in walk(base_dir) for name in files]
+    source_rules = tree_rules(source_dir)
+
+    assert sorted(found) == [
+        '.gitignore', 'pyproject.toml', 'src/package/main.py']
+    assert source_rules.ignored('generated.py')
+    assert not source_rules.ignored('main.py')
+
+
+def test_ignored_dirs_are_never_listed(tmp_path, monkeypatch):
+    for path in ('pkg/a.py', 'pkg/b.txt', '.venv/lib/site.py'):
+        Path(tmp_path, path).parent.mkdir(parents=True, exist_ok=True)
+        Path(tmp_path, path).write_text('')
+    listed = []
+    scandir = os.scandir
+    monkeypatch.setattr('os.scandir', lambda path: (
+        listed.append(Path(path)) or scandir(path)))
+
+    files = list(iter_files(tmp_path, suffix='.py'))
+
+    assert files == [Path(tmp_path, 'pkg', 'a.py')]
+    assert listed == [tmp_path, Path(tmp_path, 'pkg')]
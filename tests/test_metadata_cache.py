@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+
+from package.metadata_cache import MetadataCache
+
+
+def test_value_is_read_again_only_when_the_file_changes(tmp_path):
+    version_file = Path(tmp_path, '_version.py')
+    version_file.write_text("__version__ = '1.0.0'")
+    cache_path = Path(tmp_path, 'data', 'metadata_cache.json')
+    reads = []
+
+    def read() -> str:
+        reads.append(1)
+        return version_file.read_text()
+
+    cache = MetadataCache(cache_path)
+    cache.value(version_file, read)
+    cache.save()
+
+    warm = MetadataCache(cache_path)
+    assert warm.value(version_file, read) == "__version__ = '1.0.0'"
+    assert len(reads) == 1
+
+    version_file.write_text("__version__ = '1.0.10'")
+    os.utime(version_file, ns=(0, 1))
+    assert warm.value(version_file, read) == "__version__ = '1.0.10'"
+    assert len(reads) == 2
+
+
+def test_missing_file_is_cached(tmp_path):
+    cache = MetadataCache(Path(tmp_path, 'metadata_cache.json'))
+
+    cache.value(Path(tmp_path, 'HISTORY.md'), lambda: '')
+
+    assert cache.value(Path(tmp_path, 'HISTORY.md'), lambda: 'read') == ''
@@ -0,0 +1,78 @@
+import builtins
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from psiutils.constants import Status
+
+from package.projects import ProjectServer
+
+PROJECT_FILES = {
+    'pyproject.toml': b'[project]\nversion = "1.2.3"\n',
+    'HISTORY.md': b'Version 1.2.3\n',
+}
+
+
+@pytest.fixture(name='project_data')
+def fixture_project_data(tmp_path, make_project, monkeypatch) -> None:
+    """Register projects alpha and beta, with DATA_DIR in tmp_path."""
+    data_dir = Path(tmp_path, 'data')
+    for module in ('projects', 'metadata_cache', 'env_index'):
+        monkeypatch.setattr(f'package.{module}.DATA_DIR', str(data_dir))
+    projects = {}
+    for name in ('alpha', 'beta'):
+        base_dir = make_project(name, PROJECT_FILES | {
+            f'src/{name}/_version.py': b"__version__ = '1.2.3'\n"})
+        projects[name] = {
+            'dir': str(Path(base_dir, 'src', name)),
+            'pypi': False,
+            'cached_envs': {},
+        }
+    data_dir.mkdir()
+    Path(data_dir, 'projects.json').write_text(json.dumps(projects))
+
+
+@pytest.mark.usefixtures('project_data')
+def test_project_files_are_read_on_first_use(tmp_path, monkeypatch):
+    opened = []
+    real_open = builtins.open
+
+    def recording_open(file, *args, **kwargs):
+        opened.append(Path(file))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', recording_open)
+    server = ProjectServer()
+    alpha = Path(tmp_path, 'alpha')
+    assert not [path for path in opened if path.is_relative_to(alpha)]
+
+    assert server.projects['alpha'].project_version == '1.2.3'
+    assert Path(alpha, 'src', 'alpha', '_version.py') in opened
+    assert not [path for path in opened
+                if path.is_relative_to(Path(tmp_path, 'beta'))]
+
+
+@pytest.mark.usefixtures('project_data')
+def test_prefetch_loads_every_project():
+    server = ProjectServer()
+    server._prefetch()
+
+    for project in server.projects.values():
+        assert project._data_loaded
+        assert project._project_version == '1.2.3'
+        assert project._pyproject_version == '1.2.3'
+    assert server.metadata_cache.path.is_file()
+
+
+@pytest.mark.usefixtures('project_data')
+def test_refresh_all_reports_a_failed_save(tmp_path):
+    server = ProjectServer()
+    server.env_index = SimpleNamespace(
+        refresh=lambda names: {name: {} for name in names}, incomplete=False)
+    assert server.refresh_all() == Status.OK
+
+    Path(tmp_path, 'file').write_text('')
+    server.project_file = Path(tmp_path, 'file', 'data', 'projects.json')
+
+    assert server.refresh_all() == Status.ERROR
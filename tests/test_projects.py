@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 import pytest
 from package.projects import Project
 
@@ -72,3 +74,13 @@ def test_serialize_error_cases(test_id, source_dir, cached_envs, exception):
     # Act / Assert
     with pytest.raises(exception):
         project.serialize()
+
+
+def test_get_versions_reports_an_incomplete_scan():
+    project = Project()
+    project.name = 'alpha'
+    project.env_index = SimpleNamespace(
+        refresh=lambda names: {'alpha': {'tools': 'env'}}, incomplete=True)
+
+    assert project.get_versions(refresh=True) == {'tools': 'env'}
+    assert project.scan_incomplete
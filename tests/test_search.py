@@ -0,0 +1,119 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+import package.search as search_module
+from package.search import Hit, SearchQuery, file_hits, line_hits
+from package.trigram_index import TrigramIndex
+
+
+@pytest.fixture(name='projects')
+def fixture_projects(tmp_path, monkeypatch, make_project):
+    monkeypatch.setattr(
+        search_module, 'TrigramIndex',
+        lambda: TrigramIndex(Path(tmp_path, 'trigram_index.sqlite')))
+    return {
+        'alpha': make_project('alpha', {
+            'a.py': b'# caf\xe9 (latin-1)\nGeometry = 1\n',
+            'notes.txt': b'geometry'}),
+        'beta': make_project('beta', {'b.py': b'geometry_text = 2'}),
+    }
+
+
+def test_query_options(projects):
+    def found(**options) -> list[str]:
+        return sorted({hit.project for hit in line_hits(
+            SearchQuery('geometry', **options), projects)})
+
+    assert found() == ['alpha', 'beta']
+    assert found(match_case=True) == ['beta']
+    assert found(whole_word=True) == ['alpha']
+    assert found(match_case=True, whole_word=True, suffix='') == ['alpha']
+
+
+def test_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    path = Path(tmp_path, 'big.py')
+    path.write_bytes(b'x' * 100 + b'needle')
+    monkeypatch.setattr(search_module, 'MMAP_THRESHOLD', 10)
+
+    assert file_hits(path, SearchQuery('NEEDLE'), 1) == [
+        (1, 'x' * 100 + 'needle', 'NEEDLE')]
+    assert not file_hits(path, SearchQuery('NEEDLE', True), 1)
+
+
+def test_cancelled_search_stops(projects):
+    cancelled = threading.Event()
+    cancelled.set()
+
+    assert not list(line_hits(SearchQuery('geometry'), projects,
+                              cancelled=cancelled))
+
+
+def test_line_hits(projects):
+    hits = list(line_hits(SearchQuery('geometry', suffix=''), projects))
+
+    assert hits == [
+        Hit('alpha', 'a.py', 2, 'Geometry = 1', 'geometry'),
+        Hit('alpha', 'notes.txt', 1, 'geometry', 'geometry'),
+        Hit('beta', 'b.py', 1, 'geometry_text = 2', 'geometry'),
+    ]
+
+
+def test_line_hits_are_capped(tmp_path, monkeypatch, make_project):
+    monkeypatch.setattr(
+        search_module, 'TrigramIndex',
+        lambda: TrigramIndex(Path(tmp_path, 'trigram_index.sqlite')))
+    projects = {
+        'gamma': make_project('gamma', {
+            'c.py': b'x = 1  # x\n' * 5,
+            'd.py': b'x = 2\n' * 5}),
+    }
+    query = SearchQuery('x')
+
+    hits = list(line_hits(query, projects, per_file=2, limit=10))
+    assert [(hit.path, hit.line) for hit in hits] == [
+        ('c.py', 1), ('c.py', 2), ('d.py', 1), ('d.py', 2)]
+    assert len(list(line_hits(query, projects, per_file=4, limit=6))) == 6
+
+
+def test_several_terms_in_one_pass(projects):
+    query = SearchQuery('geometry, Geometry_text missing', multi=True)
+
+    assert query.terms == ('geometry', 'Geometry_text', 'missing')
+    assert not query.is_symbol
+    hits = list(line_hits(query, projects))
+    assert [(hit.project, hit.path, hit.term) for hit in hits] == [
+        ('alpha', 'a.py', 'geometry'),
+        ('beta', 'b.py', 'geometry'),
+        ('beta', 'b.py', 'Geometry_text'),
+    ]
+
+
+def test_each_term_is_reported_once_per_line(tmp_path):
+    path = Path(tmp_path, 'a.py')
+    path.write_bytes(b'spam = eggs + spam\nspam\n')
+    query = SearchQuery('eggs spam', match_case=True, multi=True)
+
+    assert file_hits(path, query, 10) == [
+        (1, 'spam = eggs + spam', 'spam'),
+        (1, 'spam = eggs + spam', 'eggs'),
+        (2, 'spam', 'spam'),
+    ]
+
+
+def test_only_find_usages_uses_the_symbol_index():
+    assert not SearchQuery('geometry', whole_word=True).is_symbol
+    assert SearchQuery('psiutils.geometry', find_usages=True).is_symbol
+    assert not SearchQuery('x = 1', find_usages=True).is_symbol
+
+
+def test_overlapping_terms_are_all_reported(tmp_path):
+    path = Path(tmp_path, 'a.py')
+    path.write_bytes(b'utils.window_resize(x)\n')
+    query = SearchQuery('resize window_resize', multi=True)
+
+    assert file_hits(path, query, 10) == [
+        (1, 'utils.window_resize(x)', 'window_resize'),
+        (1, 'utils.window_resize(x)', 'resize'),
+    ]
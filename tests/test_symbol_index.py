@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from package.digest_cache import DigestCache
+from package.symbol_index import SymbolIndex
+
+
+def _index(tmp_path: Path) -> SymbolIndex:
+    return SymbolIndex(
+        Path(tmp_path, 'data', 'symbol_index.sqlite'),
+        DigestCache(Path(tmp_path, 'data', 'digest_cache.json')))
+
+
+def _write(path: Path, text: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def test_calls_are_found_through_imports(tmp_path):
+    base_dir = Path(tmp_path, 'app')
+    main = _write(Path(base_dir, 'src', 'app', 'forms', 'main.py'), '\n'.join([
+        'import psiutils.utilities as utils',
+        'from psiutils.utilities import geometry',
+        'from ..text import Text',
+        '',
+        'class Main():',
+        '    def show(self):',
+        '        geometry(self.config, __file__)',
+        '        utils.geometry(None)',
+        '        return Text().title',
+    ]))
+    _write(Path(base_dir, 'src', 'app', 'broken.py'), 'def (')
+    index = _index(tmp_path)
+
+    index.update({'app': base_dir})
+
+    calls = index.usages('psiutils.utilities.geometry', kinds=('call',))
+    assert [(usage.path, usage.line) for usage in calls] == [
+        (str(main), 7), (str(main), 8)]
+    assert [usage.name for usage in index.usages('Main.show')] == [
+        'app.forms.main.Main.show']
+    assert [usage.kind for usage in index.usages('app.text.Text')] == [
+        'import', 'call']
+
+
+def test_only_changed_files_are_parsed(tmp_path):
+    base_dir = Path(tmp_path, 'app')
+    _write(Path(base_dir, 'a.py'), 'import os')
+    path = _write(Path(base_dir, 'b.py'), 'import sys')
+    index = _index(tmp_path)
+    assert index.update({'app': base_dir}) == 2
+
+    path.write_text('import json, re')
+
+    assert index.update({'app': base_dir}) == 1
+    assert index.usages('sys') == []
+    assert [usage.project for usage in index.usages('JSON', match_case=False)
+            ] == ['app']
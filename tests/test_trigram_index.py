@@ -0,0 +1,52 @@
+import os
+from pathlib import Path
+
+from package.trigram_index import TrigramIndex
+
+
+def _index(tmp_path: Path) -> TrigramIndex:
+    return TrigramIndex(Path(tmp_path, 'data', 'trigram_index.sqlite'))
+
+
+def test_candidates_hold_every_trigram_of_the_term(tmp_path, make_project):
+    alpha = make_project('alpha', {
+        'a.py': b'def Compare_Many(): ...', 'b.py': b'many compares'})
+    beta = make_project('beta', {
+        'c.py': b'x', 'image.png': b'\x89PNG\0compare_many'})
+    index = _index(tmp_path)
+
+    index.update({'alpha': alpha, 'beta': beta})
+
+    assert index.candidates('compare_many') == {'alpha': [Path(alpha, 'a.py')]}
+    assert index.candidates('x') == {
+        'alpha': [Path(alpha, 'a.py'), Path(alpha, 'b.py')],
+        'beta': [Path(beta, 'c.py')]}
+
+
+def test_update_reads_only_changed_files(tmp_path, make_project):
+    alpha = make_project('alpha', {'a.py': b'old', 'b.py': b'same'})
+    index = _index(tmp_path)
+    assert index.update({'alpha': alpha}) == 2
+    index.close()
+
+    Path(alpha, 'a.py').write_bytes(b'newer')
+    os.utime(Path(alpha, 'a.py'), ns=(0, 1))
+    Path(alpha, 'b.py').unlink()
+    index = _index(tmp_path)
+
+    assert index.update({'alpha': alpha}) == 1
+    assert index.candidates('newer') == {'alpha': [Path(alpha, 'a.py')]}
+    assert index.candidates('same') == {}
+    assert index.update({}) == 0
+    assert index.candidates('') == {}
+
+
+def test_binary_files_are_remembered_but_never_candidates(
+        tmp_path, make_project):
+    alpha = make_project('alpha', {'img.png': b'\x89PNG\0data'})
+    index = _index(tmp_path)
+
+    assert index.update({'alpha': alpha}) == 1
+    assert index.update({'alpha': alpha}) == 0
+    assert index.candidates('') == {}
+    assert index.candidates('data') == {}
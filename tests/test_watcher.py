@@ -0,0 +1,113 @@
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from package.env_index import EnvIndex
+from package.watcher import PollingWatcher, WatchService
+
+
+def _changes(watcher: PollingWatcher, timeout: float = 2.0) -> set[str]:
+    deadline = time.monotonic() + timeout
+    changed = set()
+    while not changed and time.monotonic() < deadline:
+        time.sleep(0.02)
+        changed = watcher.changes()
+    return changed
+
+
+def test_polling_watcher_reports_changed_directories(tmp_path):
+    source = Path(tmp_path, 'src')
+    Path(source, 'sub', '__pycache__').mkdir(parents=True)
+    Path(source, 'sub', 'a.py').write_text('a')
+    watcher = PollingWatcher(interval=0.02)
+    watcher.watch(source, recursive=True)
+    watcher.start()
+    try:
+        Path(source, 'sub', '__pycache__', 'a.cpython-311.pyc').write_text('')
+        assert not _changes(watcher, 0.2)
+
+        Path(source, 'sub', 'b.py').write_text('b')
+        assert _changes(watcher) == {str(Path(source, 'sub'))}
+    finally:
+        watcher.stop()
+
+
+def test_changed_paths_are_mapped_to_projects(tmp_path):
+    env_dir = str(Path(tmp_path, 'env', 'site-packages', 'alpha'))
+    projects = {
+        'alpha': SimpleNamespace(
+            source_dir=str(Path(tmp_path, 'alpha', 'src')),
+            cached_envs={'tools': SimpleNamespace(dir=env_dir)}),
+        'beta': SimpleNamespace(
+            source_dir=str(Path(tmp_path, 'beta', 'src')), cached_envs={}),
+    }
+    service = WatchService(
+        SimpleNamespace(projects=projects), index=SimpleNamespace())
+
+    assert service.apply_changes({
+        str(Path(tmp_path, 'alpha', 'src', 'forms')),
+        str(Path(env_dir, 'forms')),
+        str(Path(tmp_path, 'beta', 'src')),
+    }) == ({'alpha', 'beta'}, {})
+    assert service.poll() == set()
+
+
+def test_stop_does_not_wait_for_a_busy_worker(monkeypatch):
+    service = WatchService(
+        SimpleNamespace(projects={}), index=SimpleNamespace())
+    monkeypatch.setattr(service, '_run', lambda: time.sleep(5))
+    service.start()
+
+    start = time.monotonic()
+    service.stop()
+
+    assert time.monotonic() - start < 2
+
+
+def test_new_envs_are_applied_and_saved_by_poll():
+    saves = []
+    project = SimpleNamespace(source_dir='', cached_envs={})
+    service = WatchService(
+        SimpleNamespace(projects={'alpha': project},
+                        save_projects=lambda: saves.append(1)),
+        index=SimpleNamespace())
+    envs = {'tools': SimpleNamespace(dir='')}
+    heard = []
+    service.subscribe(heard.append)
+
+    service._changed.put((set(), {'alpha': envs}))
+    assert project.cached_envs == {}
+
+    assert service.poll() == {'alpha'}
+    assert project.cached_envs is envs
+    assert saves == [1]
+    assert heard == [{'alpha'}]
+
+
+def test_an_upgrade_is_applied_to_the_project(tmp_path, install):
+    site_packages = Path(tmp_path, '.pyenv', 'versions', 'tools', 'lib',
+                         'python3.11', 'site-packages')
+    install(site_packages, 'alpha', '1.0.0')
+    Path(site_packages, 'alpha-1.0.0.dist-info').mkdir()
+    index = EnvIndex([Path(tmp_path, '.pyenv', 'versions')],
+                     Path(tmp_path, 'env_index.json'))
+    project = SimpleNamespace(
+        source_dir='', cached_envs=index.refresh(['alpha'])['alpha'])
+    service = WatchService(
+        SimpleNamespace(projects={'alpha': project},
+                        save_projects=lambda: None),
+        index=index, interval=0.02)
+    service.start()
+    try:
+        assert service.ready.wait(2)
+        Path(site_packages, 'alpha-1.0.0.dist-info').rename(
+            Path(site_packages, 'alpha-1.1.0.dist-info'))
+        Path(site_packages, 'alpha', '_version.py').write_text('1.1.0')
+
+        deadline = time.monotonic() + 2
+        while (not service.poll()) and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        service.stop()
+
+    assert project.cached_envs['tools'].version == '1.1.0'